@@ -0,0 +1,37 @@
+from django.urls import URLPattern, include, path
+
+from .async_views import async_view
+from .urls import router_v1
+from .urls import urlpatterns as sync_urlpatterns
+
+# Read-heavy routes served concurrently under ASGI.
+ASYNC_ROUTES = {
+    'recipe-list',
+    'recipe-detail',
+    'recipe-download-shopping-cart',
+    'recipe-feed',
+    'recipe-match',
+    'recipe-similar',
+    'recipe-trending',
+    'tag-list',
+    'tag-detail',
+    'ingredient-list',
+    'ingredient-detail',
+}
+
+
+def make_async(pattern):
+    if pattern.name not in ASYNC_ROUTES:
+        return pattern
+    return URLPattern(
+        pattern.pattern,
+        async_view(pattern.callback),
+        pattern.default_args,
+        pattern.name
+    )
+
+
+urlpatterns = [
+    path('', include([make_async(pattern) for pattern in router_v1.urls])),
+    *sync_urlpatterns[1:],
+]
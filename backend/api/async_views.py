@@ -0,0 +1,44 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponse
+
+
+def run_view(view, request, *args, **kwargs):
+    """Run a view to a fully rendered response in a worker thread."""
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        if response.streaming:
+            # The server would iterate a streaming body in the event loop,
+            # where database access is not allowed.
+            streamed = response
+            response = HttpResponse(
+                b''.join(streamed.streaming_content),
+                status=streamed.status_code
+            )
+            for header, value in streamed.items():
+                response[header] = value
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Serve a synchronous view from the thread pool under ASGI.
+
+    Django runs plain views of an ASGI application one at a time in a
+    single thread per process, so a slow query holds up every request.
+    Wrapped views run concurrently in the default executor instead.
+    """
+    run = sync_to_async(run_view, thread_sensitive=False)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
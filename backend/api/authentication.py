@@ -0,0 +1,69 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+KEY_PREFIX = 'auth_token'
+# Left deferred in a snapshot: counters change without saving the user.
+NOT_CACHED = ('password', 'recipes_count', 'followers_count')
+
+
+def get_cache():
+    return caches[settings.TOKEN_AUTH_CACHE]
+
+
+def cache_key(key):
+    return f'{KEY_PREFIX}:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def snapshot(user):
+    return {
+        field.attname: getattr(user, field.attname)
+        for field in User._meta.concrete_fields
+        if field.attname not in NOT_CACHED
+    }
+
+
+def restore(data):
+    """User from a snapshot, other fields load from the database on use."""
+    names = [
+        field.attname for field in User._meta.concrete_fields
+        if field.attname in data
+    ]
+    return User.from_db(None, names, [data[name] for name in names])
+
+
+def forget(*keys):
+    get_cache().delete_many([cache_key(key) for key in keys])
+
+
+def forget_user(user_id):
+    forget(*Token.objects.filter(user_id=user_id).values_list(
+        'key', flat=True
+    ))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that caches the user of a token.
+
+    Saves the token and user lookup on every authenticated request. The
+    TOKEN_AUTH_CACHE is a per-process LRU unless set to a shared cache;
+    entries live TOKEN_AUTH_CACHE_TIMEOUT seconds and are dropped when
+    the token is deleted, which logout does, and when the user is saved.
+    """
+
+    def authenticate_credentials(self, key):
+        data = get_cache().get(cache_key(key))
+        if data is None:
+            user, token = super().authenticate_credentials(key)
+            get_cache().set(
+                cache_key(key),
+                snapshot(user),
+                settings.TOKEN_AUTH_CACHE_TIMEOUT
+            )
+            return user, token
+        user = restore(data)
+        return user, Token(key=key, user=user)
@@ -0,0 +1,99 @@
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import caches
+from foodgram import replicas
+
+FEED_PREFIX = 'recipe_feed'
+ALL = 'all'
+UNFILTERED = 'unfiltered'
+
+
+def get_cache():
+    return caches[settings.RECIPE_FEED_CACHE]
+
+
+def generation_key(scope):
+    return f'{FEED_PREFIX}:gen:{scope}'
+
+
+def tag_scope(slug):
+    return f'tag:{slug}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def bump(*scopes):
+    """Invalidate every cached page that depends on one of the scopes."""
+    get_cache().set_many(
+        {generation_key(scope): uuid4().hex for scope in scopes}, None
+    )
+    replicas.fence()
+
+
+def generations(scopes):
+    cache = get_cache()
+    keys = [generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in found}
+    for key, value in missing.items():
+        if not cache.add(key, value, None):
+            value = cache.get(key, value)
+        found[key] = value
+    return [found[key] for key in keys]
+
+
+def feed_key(request):
+    """Cache key of an anonymous recipe list page.
+
+    Pages filtered by tags or author depend only on the generations of
+    those tags and that author; the unfiltered feed has a generation of
+    its own. The `all` generation covers data nested into every recipe.
+    """
+    params = sorted(
+        (name, tuple(sorted(request.query_params.getlist(name))))
+        for name in request.query_params
+    )
+    tags = request.query_params.getlist('tags')
+    author = request.query_params.get('author')
+    scopes = [ALL]
+    scopes.extend(tag_scope(slug) for slug in sorted(set(tags)))
+    if author:
+        scopes.append(author_scope(author))
+    if len(scopes) == 1:
+        scopes.append(UNFILTERED)
+
+    digest = hashlib.sha1(request.get_host().encode())
+    digest.update(repr(params).encode())
+    for generation in generations(scopes):
+        digest.update(generation.encode())
+    return f'{FEED_PREFIX}:page:{digest.hexdigest()}'
+
+
+def recipe_scope(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def fragment_keys(recipe_ids, host):
+    """Versioned cache keys of the serialized recipes by recipe id."""
+    scopes = [ALL] + [recipe_scope(recipe_id) for recipe_id in recipe_ids]
+    common, *versions = generations(scopes)
+    return {
+        recipe_id: f'{FEED_PREFIX}:recipe:{host}:{recipe_id}:'
+                   f'{common}:{version}'
+        for recipe_id, version in zip(recipe_ids, versions)
+    }
+
+
+def invalidate_recipe(recipe, tag_slugs=None):
+    if tag_slugs is None:
+        tag_slugs = recipe.tags.values_list('slug', flat=True)
+    bump(
+        UNFILTERED,
+        recipe_scope(recipe.pk),
+        author_scope(recipe.author_id),
+        *(tag_scope(slug) for slug in tag_slugs)
+    )
@@ -0,0 +1,80 @@
+import csv
+import hashlib
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+
+PAGE_SIZE = (1240, 1754)
+MARGIN = 100
+LINE_HEIGHT = 40
+FONT_SIZE = 28
+
+
+def shopping_list_etag(amounts, today):
+    """ETag of the shopping list built from (ingredient id, amount) pairs."""
+    digest = hashlib.sha1(today.encode())
+    for ingredient_id, amount in amounts:
+        digest.update(f'{ingredient_id}:{amount};'.encode())
+    return digest.hexdigest()
+
+
+def export_txt(title, ingredients):
+    yield f'{title}\n\n'
+    for name, measurement_unit, amount in ingredients:
+        yield f'{name} - {amount} {measurement_unit}\n'
+
+
+class Echo:
+    """File-like object that hands back what csv.writer writes into it."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(title, ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow((title,))
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for name, measurement_unit, amount in ingredients:
+        yield writer.writerow((name, amount, measurement_unit))
+
+
+def get_font():
+    try:
+        return ImageFont.truetype(settings.SHOPPING_LIST_FONT, FONT_SIZE)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def export_pdf(title, ingredients):
+    font = get_font()
+    lines_per_page = (PAGE_SIZE[1] - 2 * MARGIN) // LINE_HEIGHT
+    lines = [title, ''] + [
+        f'{name} - {amount} {measurement_unit}'
+        for name, measurement_unit, amount in ingredients
+    ]
+    pages = []
+    for start in range(0, len(lines), lines_per_page):
+        page = Image.new('RGB', PAGE_SIZE, 'white')
+        draw = ImageDraw.Draw(page)
+        for number, line in enumerate(lines[start:start + lines_per_page]):
+            draw.text(
+                (MARGIN, MARGIN + number * LINE_HEIGHT),
+                line, font=font, fill='black'
+            )
+        pages.append(page)
+
+    buffer = BytesIO()
+    pages[0].save(
+        buffer, format='PDF', save_all=True,
+        append_images=pages[1:], resolution=150
+    )
+    yield buffer.getvalue()
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'pdf': export_pdf,
+}
@@ -1,5 +1,6 @@
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import FilterSet, filters
+from recipes import search
 from recipes.models import Ingredient, Recipe, Tag
 
 User = get_user_model()
@@ -23,6 +24,7 @@ class RecipeFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
@@ -39,3 +41,8 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(shopping_cart__author=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        if value.strip():
+            return search.search(queryset, value)
+        return queryset
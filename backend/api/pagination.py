@@ -1,6 +1,135 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ApproximatePage(Page):
+    """Page of an estimated count, which knows from its rows if it is last."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator counting exactly only up to APPROXIMATE_COUNT_THRESHOLD.
+
+    Larger results are counted by the PostgreSQL planner estimate, or
+    exactly on other databases, and kept in the cache per query for
+    APPROXIMATE_COUNT_TIMEOUT seconds, after which they are recounted.
+    The count is keyed on the filtered primary keys only, so per-user
+    annotations do not split it. An estimate may be too low, so pages
+    are then bounded by their rows instead of by the count.
+    """
+
+    @property
+    def approximate(self):
+        return (
+            isinstance(self.object_list, QuerySet)
+            and self.count > settings.APPROXIMATE_COUNT_THRESHOLD
+        )
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return len(self.object_list)
+        queryset = self.object_list.values('pk').order_by()
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'approximate_count:' + hashlib.sha1(
+            f'{sql}{params}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is not None:
+            return count
+
+        threshold = settings.APPROXIMATE_COUNT_THRESHOLD
+        count = queryset[:threshold + 1].count()
+        if count <= threshold:
+            return count
+        count = self.estimate(queryset, sql, params)
+        cache.set(key, count, settings.APPROXIMATE_COUNT_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        if not self.approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return super().validate_number(number)
+        if number < 1:
+            raise EmptyPage(_('That page number is less than 1'))
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.approximate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(_('That page contains no results'))
+        return ApproximatePage(
+            rows[:self.per_page], number, self,
+            has_more=len(rows) > self.per_page
+        )
+
+    def estimate(self, queryset, sql, params):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return queryset.count()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        return max(
+            int(plan[0]['Plan']['Plan Rows']),
+            settings.APPROXIMATE_COUNT_THRESHOLD + 1
+        )
+
+
+class CustomCursorPagination(CursorPagination):
+    """Keyset pagination on the ordering of the queryset, without COUNT."""
+    page_size_query_param = 'limit'
+    page_size = 6
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    django_paginator_class = ApproximateCountPaginator
+    cursor_pagination_class = CustomCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if (isinstance(queryset, QuerySet)
+                and self.cursor_pagination_class.cursor_query_param
+                in request.query_params):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
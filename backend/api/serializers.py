@@ -1,12 +1,18 @@
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from collections import Counter
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
 from django.utils.translation import gettext_lazy as _
 from drf_extra_fields.fields import Base64ImageField
+from recipes import images, shopping_list
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 from rest_framework import serializers, status, validators
 from users.models import Follow, User
 
+from . import cache
+
 
 class UserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
@@ -26,6 +32,8 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -81,12 +89,39 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+class ImageSrcsetField(serializers.Field):
+    """WebP variants of the recipe image as an HTML srcset value."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        return ', '.join(
+            '{} {}w'.format(
+                request.build_absolute_uri(url) if request else url, width
+            )
+            for url, width in images.srcset(recipe)
+        )
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return self.child.to_representation_many(list(data))
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     author = UserSerializer(read_only=True)
     image = Base64ImageField()
+    image_srcset = ImageSrcsetField()
     ingredients = RecipeIngredientSerializer(
         many=True, read_only=True,
         source='recipe_ingredients'
@@ -96,13 +131,99 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = (
             'id', 'tags', 'author',
-            'ingredients', 'name', 'image',
+            'ingredients', 'name', 'image', 'image_srcset',
             'text', 'cooking_time',
             'is_favorited',
             'is_in_shopping_cart',
         )
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.to_representation_many([instance])[0]
+
+    def to_representation_many(self, recipes):
+        """Render recipes from cached user-independent fragments.
+
+        Only cache misses are prefetched and serialized; the per-user
+        flags are loaded for the whole batch and merged into copies.
+        Misses are not stored with the `cache_fragments` context False.
+        """
+        self.load_user_flags(recipes)
+        request = self.context.get('request')
+        keys = cache.fragment_keys(
+            [recipe.pk for recipe in recipes],
+            request.get_host() if request is not None else ''
+        )
+        fragments = cache.get_cache().get_many(keys.values())
+        misses = [
+            recipe for recipe in recipes if keys[recipe.pk] not in fragments
+        ]
+        if misses:
+            prefetch_related_objects(
+                misses, 'tags', 'recipe_ingredients__ingredient'
+            )
+            rendered = {
+                keys[recipe.pk]: self.to_fragment(recipe)
+                for recipe in misses
+            }
+            if self.context.get('cache_fragments', True):
+                cache.get_cache().set_many(
+                    rendered, settings.RECIPE_FRAGMENT_CACHE_TIMEOUT
+                )
+            fragments.update(rendered)
+
+        result = []
+        for recipe in recipes:
+            data = dict(fragments[keys[recipe.pk]])
+            data['author'] = dict(
+                data['author'], is_subscribed=recipe.author.is_subscribed
+            )
+            data['is_favorited'] = recipe.is_favorited
+            data['is_in_shopping_cart'] = recipe.is_in_shopping_cart
+            result.append(data)
+        return result
+
+    def to_fragment(self, recipe):
+        data = super().to_representation(recipe)
+        data.pop('is_favorited')
+        data.pop('is_in_shopping_cart')
+        data['author'].pop('is_subscribed')
+        return dict(data)
+
+    def load_user_flags(self, recipes):
+        request = self.context.get('request')
+        user = request.user if request is not None else None
+        authors = [
+            recipe.author for recipe in recipes
+            if not hasattr(recipe.author, 'is_subscribed')
+        ]
+        recipes = [
+            recipe for recipe in recipes
+            if not hasattr(recipe, 'is_favorited')
+            or not hasattr(recipe, 'is_in_shopping_cart')
+        ]
+        favorites = carts = follows = set()
+        if user is not None and not user.is_anonymous:
+            if recipes:
+                favorites = set(Favorite.objects.filter(
+                    user=user, recipe__in=recipes
+                ).values_list('recipe_id', flat=True))
+                carts = set(ShoppingCart.objects.filter(
+                    author=user, recipe__in=recipes
+                ).values_list('recipe_id', flat=True))
+            if authors:
+                follows = set(Follow.objects.filter(
+                    follower=user, author__in=authors
+                ).values_list('author_id', flat=True))
+        for recipe in recipes:
+            recipe.is_favorited = recipe.pk in favorites
+            recipe.is_in_shopping_cart = recipe.pk in carts
+        for author in authors:
+            author.is_subscribed = author.pk in follows
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -111,6 +232,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -120,12 +243,13 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 
 class MiniRecipeSerializer(serializers.ModelSerializer):
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'name',
-            'image', 'cooking_time'
+            'image', 'image_srcset', 'cooking_time'
         )
 
 
@@ -148,20 +272,24 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                 _('Minimum 1 ingredient')
             )
 
-        ingredients_list = []
-        for item in ingredients:
-            ingredient = get_object_or_404(
-                Ingredient, id=item['id']
+        ids = [item['id'] for item in ingredients]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                _('Ingredients should be unique')
             )
-            if ingredient in ingredients_list:
-                raise serializers.ValidationError(
-                    _('Ingredients should be unique')
-                )
-            if int(item['amount']) <= 0:
-                raise serializers.ValidationError(
-                    _('Amount should be more than 0!')
-                )
-            ingredients_list.append(ingredient)
+        if any(int(item['amount']) <= 0 for item in ingredients):
+            raise serializers.ValidationError(
+                _('Amount should be more than 0!')
+            )
+
+        found = Ingredient.objects.in_bulk(ids)
+        missing = [str(pk) for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                _('Ingredients do not exist: {}').format(', '.join(missing))
+            )
+        for item in ingredients:
+            item['ingredient'] = found[item['id']]
 
         return ingredients
 
@@ -181,17 +309,18 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
 
+        validated_data['image'] = images.store(validated_data['image'])
+
         with transaction.atomic():
             recipe = Recipe.objects.create(
                 author=author, **validated_data
             )
+            images.schedule(recipe)
             recipe.tags.set(tags_data)
 
             recipe_ingredients = [
                 RecipeIngredient(
-                    ingredient=get_object_or_404(
-                        Ingredient, pk=ingredient['id']
-                    ),
+                    ingredient=ingredient['ingredient'],
                     recipe=recipe,
                     amount=ingredient['amount']
                 )
@@ -204,43 +333,94 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        instance = super().update(instance, validated_data)
+        image_changed = False
+        if 'image' in validated_data:
+            validated_data['image'] = images.store(validated_data['image'])
+            if validated_data['image'] != instance.image.name:
+                validated_data['image_widths'] = []
+                image_changed = True
 
         with transaction.atomic():
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save(update_fields=[
+                field.attname for field in Recipe._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in Recipe.COUNTER_FIELDS
+                and (image_changed or field.name != 'image_widths')
+            ])
+            if image_changed:
+                images.schedule(instance)
             if tags is not None:
-                instance.tags.clear()
-                instance.tags.set(tags)
-
+                self.update_tags(instance, tags)
             if ingredients is not None:
-                new_recipe_ingredients = []
-                instance.ingredients.clear()
-
-                for ingredient in ingredients:
-                    amount = ingredient['amount']
-                    ingredient_id = ingredient['id']
-                    ingredient = get_object_or_404(
-                        Ingredient, pk=ingredient_id
-                    )
-
-                    recipe_ingredient, created = (
-                        RecipeIngredient.objects.update_or_create(
-                            recipe=instance,
-                            ingredient=ingredient,
-                            defaults={'amount': amount}
-                        )
-                    )
-                    new_recipe_ingredients.append(recipe_ingredient.pk)
-
-                RecipeIngredient.objects.filter(
-                    recipe=instance
-                ).exclude(
-                    pk__in=new_recipe_ingredients
-                ).delete()
-
-        return super().update(instance, validated_data)
+                self.update_ingredients(instance, ingredients)
+
+        return instance
+
+    def update_tags(self, instance, tags):
+        current = set(instance.tags.values_list('pk', flat=True))
+        desired = {tag.pk for tag in tags}
+        if current - desired:
+            instance.tags.remove(*(current - desired))
+        if desired - current:
+            instance.tags.add(*(desired - current))
+
+    def update_ingredients(self, instance, ingredients):
+        current = {}
+        old_amounts = Counter()
+        to_delete = []
+        for recipe_ingredient in RecipeIngredient.objects.filter(
+            recipe=instance
+        ):
+            old_amounts[recipe_ingredient.ingredient_id] += (
+                recipe_ingredient.amount
+            )
+            if recipe_ingredient.ingredient_id in current:
+                to_delete.append(recipe_ingredient.pk)
+            else:
+                current[recipe_ingredient.ingredient_id] = recipe_ingredient
+
+        desired = {
+            item['ingredient'].pk: item['amount'] for item in ingredients
+        }
+        to_create = []
+        to_update = []
+        for ingredient_id, amount in desired.items():
+            recipe_ingredient = current.get(ingredient_id)
+            if recipe_ingredient is None:
+                to_create.append(RecipeIngredient(
+                    recipe=instance,
+                    ingredient_id=ingredient_id,
+                    amount=amount
+                ))
+            elif recipe_ingredient.amount != amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        to_delete.extend(
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in desired
+        )
+
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_delete:
+            RecipeIngredient.objects.filter(pk__in=to_delete).delete()
+        shopping_list.change_recipe(instance, old_amounts, desired)
 
     def to_representation(self, instance):
-        serializer = RecipeSerializer(instance)
+        # Variants may have been listed on the recipe since it was saved,
+        # and may still be, so the fragment is rendered but not cached.
+        instance.refresh_from_db(fields=['image_widths'])
+        prefetch_related_objects(
+            [instance], 'tags', 'recipe_ingredients__ingredient'
+        )
+        serializer = RecipeSerializer(
+            instance, context={**self.context, 'cache_fragments': False}
+        )
         return serializer.data
 
 
@@ -260,6 +440,8 @@ class FollowSerializer(serializers.ModelSerializer):
                   'last_name', 'is_subscribed', 'recipes', 'recipes_count')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         if not user.is_anonymous:
             return Follow.objects.filter(
@@ -268,9 +450,13 @@ class FollowSerializer(serializers.ModelSerializer):
         return False
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
+        return obj.author.recipes_count
 
     def get_recipes(self, obj):
+        if hasattr(obj.author, 'preview_recipes'):
+            return MiniRecipeSerializer(
+                obj.author.preview_recipes, many=True
+            ).data
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = Recipe.objects.filter(author=obj.author)
@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from recipes.images import variants_ready
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from . import authentication, cache
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    tag_slugs = list(instance.tags.values_list('slug', flat=True))
+    transaction.on_commit(
+        lambda: cache.invalidate_recipe(instance, tag_slugs)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if reverse:
+        transaction.on_commit(lambda: cache.bump(cache.ALL))
+    elif action in ('pre_clear', 'post_add', 'post_remove'):
+        invalidate_recipe(Recipe, instance)
+        if pk_set:
+            tag_slugs = list(
+                Tag.objects.filter(pk__in=pk_set).values_list(
+                    'slug', flat=True
+                )
+            )
+            transaction.on_commit(
+                lambda: cache.invalidate_recipe(instance, tag_slugs)
+            )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    # Ingredient rows are written together with their recipe, whose save
+    # covers the tag and author feeds, so no lookups are made per row.
+    transaction.on_commit(lambda: cache.bump(
+        cache.UNFILTERED, cache.recipe_scope(instance.recipe_id)
+    ))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_reference_data(sender, created=False, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: cache.bump(cache.ALL))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, created, update_fields, **kwargs):
+    if not created and set(update_fields or ()) != {'last_login'}:
+        transaction.on_commit(lambda: cache.bump(cache.ALL))
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(
+            lambda: authentication.forget_user(instance.pk)
+        )
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    # The key is the primary key, cleared by the time of the commit.
+    key = instance.key
+    transaction.on_commit(lambda: authentication.forget(key))
+
+
+@receiver(variants_ready)
+def invalidate_recipe_images(sender, recipe_ids, **kwargs):
+    for recipe in Recipe.objects.filter(pk__in=recipe_ids):
+        cache.invalidate_recipe(recipe)
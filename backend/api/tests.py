@@ -0,0 +1,288 @@
+import asyncio
+import base64
+import io
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, connections
+from django.test import (AsyncClient, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+from .views import TagViewSet
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+class RecipeListQueriesTest(TestCase):
+    """The recipe list costs the same number of queries for any page size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                email=f'user{number}@example.com',
+                username=f'user{number}',
+                first_name='Name',
+                last_name='Surname',
+                password='password-123'
+            )
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'tag{number}', color=f'#00000{number}',
+                slug=f'tag{number}'
+            )
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(name=f'ingredient{number}',
+                                      measurement_unit='g')
+            for number in range(5)
+        ]
+        for number in range(25):
+            recipe = Recipe.objects.create(
+                name=f'recipe{number}',
+                text='text',
+                cooking_time=5,
+                author=cls.users[number % 3],
+                image='media/recipe.png'
+            )
+            recipe.tags.set(tags[:1 + number % 3])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=10)
+                for ingredient in ingredients[:2 + number % 3]
+            )
+            if number % 2:
+                Favorite.objects.create(user=cls.users[0], recipe=recipe)
+            if number % 3:
+                ShoppingCart.objects.create(author=cls.users[0],
+                                            recipe=recipe)
+        Follow.objects.create(follower=cls.users[0], author=cls.users[1])
+
+    def count_queries(self, client, limit):
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/recipes/', {'limit': limit})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), limit)
+        return len(queries)
+
+    def assert_constant_queries(self, client):
+        expected = self.count_queries(client, 2)
+        clear_caches()
+        with self.assertNumQueries(expected):
+            response = client.get('/api/recipes/', {'limit': 20})
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_anonymous(self):
+        self.assert_constant_queries(APIClient())
+
+    def test_authenticated(self):
+        client = APIClient()
+        token = Token.objects.create(user=self.users[0])
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assert_constant_queries(client)
+
+
+class ReplicaRoutingTest(TransactionTestCase):
+    """Reads go to the replica unless the user wrote recently.
+
+    The replica is a second alias of the test database, so it sees the
+    rows written through the primary.
+    """
+    replica = 'replica_test'
+
+    @classmethod
+    def setUpClass(cls):
+        # Added only now, the test runner sets up the configured aliases.
+        settings.DATABASES[cls.replica] = {
+            **connections['default'].settings_dict,
+            'TEST': {'MIRROR': 'default'},
+        }
+        cls.databases = {'default', cls.replica}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        del cls.databases
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del settings.DATABASES[cls.replica]
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Name',
+            last_name='Surname',
+            password='password-123'
+        )
+        self.recipe = Recipe.objects.create(
+            name='recipe', text='text', cooking_time=5, author=self.user,
+            image='media/recipe.png'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # Drops the fence set by the invalidations of the rows above.
+        clear_caches()
+
+    def get(self, client, path):
+        with CaptureQueriesContext(connection) as primary, \
+                CaptureQueriesContext(connections[self.replica]) as replica:
+            response = client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response, len(primary), len(replica)
+
+    def test_anonymous_reads_replica(self):
+        for path in ('/api/recipes/', f'/api/recipes/{self.recipe.pk}/',
+                     '/api/tags/', '/api/ingredients/'):
+            with self.subTest(path=path):
+                _, primary, replica = self.get(APIClient(), path)
+                self.assertEqual(primary, 0)
+                self.assertGreater(replica, 0)
+
+    def test_writer_sticks_to_primary(self):
+        response, primary, replica = self.get(self.client, '/api/recipes/')
+        self.assertGreater(replica, 0)
+
+        response = self.client.post(
+            f'/api/recipes/{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+        for _ in range(2):
+            response, primary, replica = self.get(
+                self.client, '/api/recipes/'
+            )
+            self.assertGreater(primary, 0)
+            self.assertEqual(replica, 0)
+            self.assertTrue(response.data['results'][0]['is_favorited'])
+
+        caches['default'].clear()
+        _, primary, replica = self.get(self.client, '/api/recipes/')
+        self.assertGreater(replica, 0)
+
+    def test_invalidation_fences_replica(self):
+        Tag.objects.create(name='tag', color='#000000', slug='tag')
+        for path in ('/api/tags/', '/api/recipes/'):
+            with self.subTest(path=path):
+                response, primary, replica = self.get(APIClient(), path)
+                self.assertGreater(primary, 0)
+                self.assertEqual(replica, 0)
+        self.assertEqual(len(response.data['results']), 1)
+
+        caches['default'].clear()
+        _, primary, replica = self.get(APIClient(), '/api/tags/')
+        self.assertGreater(replica, 0)
+
+
+@override_settings(ROOT_URLCONF='foodgram.asgi_urls')
+class AsgiConcurrencyTest(SimpleTestCase):
+    """Slow read requests run concurrently through the ASGI handler."""
+
+    def test_concurrent_requests(self):
+        def slow_list(view, request, *args, **kwargs):
+            time.sleep(0.5)
+            return Response([])
+
+        async def get_all():
+            client = AsyncClient()
+            return await asyncio.gather(
+                *(client.get('/api/tags/') for _ in range(6))
+            )
+
+        with mock.patch.object(TagViewSet, 'list', slow_list):
+            start = time.monotonic()
+            responses = asyncio.run(get_all())
+            elapsed = time.monotonic() - start
+        self.assertEqual(
+            [response.status_code for response in responses], [200] * 6
+        )
+        self.assertLess(elapsed, 1.5)
+
+
+class TokenLogoutTest(TestCase):
+    """A cached token stops authenticating once it is logged out."""
+
+    def test_logout(self):
+        clear_caches()
+        user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Name', last_name='Surname', password='password-123'
+        )
+        token = Token.objects.create(user=user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(client.get('/api/users/me/').status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/auth/token/logout/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(client.get('/api/users/me/').status_code, 401)
+
+
+class RecipeImageVariantsTest(TransactionTestCase):
+    """Responses list image variants generated after the recipe is saved."""
+
+    def setUp(self):
+        clear_caches()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root, RECIPE_IMAGE_WORKERS=0
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            username='user',
+            first_name='Name',
+            last_name='Surname',
+            password='password-123'
+        )
+        self.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        self.ingredient = Ingredient.objects.create(
+            name='ingredient', measurement_unit='g'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (700, 400), 'red').save(buffer, 'JPEG')
+        return 'data:image/jpeg;base64,' + base64.b64encode(
+            buffer.getvalue()
+        ).decode()
+
+    def test_created_recipe(self):
+        response = self.client.post('/api/recipes/', {
+            'ingredients': [{'id': self.ingredient.pk, 'amount': 10}],
+            'tags': [self.tag.pk],
+            'image': self.image(),
+            'name': 'recipe',
+            'text': 'text',
+            'cooking_time': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['image_srcset'].split(', ')), 3)
+        for client in (self.client, APIClient()):
+            detail = client.get(f'/api/recipes/{response.data["id"]}/')
+            self.assertEqual(
+                detail.data['image_srcset'], response.data['image_srcset']
+            )
@@ -1,12 +1,25 @@
+import hashlib
+from contextlib import ExitStack
 from datetime import date
 
-from django.db.models import Sum
-from django.shortcuts import HttpResponse
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, OuterRef, Prefetch,
+                              Subquery, Value)
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.utils.translation import gettext_lazy as gtl
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from foodgram import replicas
+from recipes import feed, reference_data
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.pantry import pantry_index
+from recipes.similarity import similarity_index
 from rest_framework import filters, permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
@@ -14,15 +27,103 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from users.models import Follow, User
 
+from . import cache
+from .exporters import EXPORTERS, shopping_list_etag
 from .filters import IngredientFilter, RecipeFilter
 from .pagination import CustomPagination
 from .permission import AuthenticatedOrReadOnly, IsAuthorOrReadOnly
+from .renderers import CSVRenderer, PDFRenderer, TextRenderer
 from .serializers import (FollowSerializer, IngredientSerializer,
                           RecipeCreateSerializer, RecipeSerializer,
                           TagSerializer, UserSerializer)
 
 
-class CustomUserViewSet(UserViewSet):
+class ReplicaReadMixin:
+    """Serve safe requests from a read replica.
+
+    Only `replica_actions` are served from it, or every action if None.
+    Users who wrote recently stay on the primary to read their writes.
+    """
+    replica_actions = None
+
+    def dispatch(self, request, *args, **kwargs):
+        with ExitStack() as self.replica_stack:
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in permissions.SAFE_METHODS
+            and (
+                self.replica_actions is None
+                or self.action in self.replica_actions
+            )
+            and replicas.replica_aliases()
+            and not replicas.is_sticky(request.user)
+        ):
+            self.replica_stack.enter_context(replicas.read_from_replica())
+
+
+class ReferenceDataMixin:
+    """Conditional GET and shared caching of rarely changing data.
+
+    ETag and Last-Modified come from the version stamp of the model, so
+    a matching If-None-Match is answered with 304 before any query. The
+    unfiltered JSON list is rendered once per version.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(
+            request, self.list_response, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+    def list_response(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        model = self.queryset.model
+        version, _ = reference_data.version(model)
+        key = f'reference_data:{model._meta.label_lower}:{version}'
+        content = default_cache.get(key)
+        if content is None:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            content = request.accepted_renderer.render(
+                serializer.data,
+                request.accepted_media_type,
+                self.get_renderer_context()
+            )
+            default_cache.set(
+                key, content, settings.REFERENCE_DATA_CACHE_TIMEOUT
+            )
+        return HttpResponse(content, content_type='application/json')
+
+    def conditional(self, request, handler, *args, **kwargs):
+        version, modified = reference_data.version(self.queryset.model)
+        etag = quote_etag(hashlib.sha1(
+            f'{version}:{request.accepted_renderer.format}:'
+            f'{request.get_full_path()}'.encode()
+        ).hexdigest())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(modified)
+            patch_cache_control(
+                response,
+                public=True,
+                max_age=settings.REFERENCE_DATA_MAX_AGE
+            )
+        return response
+
+
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
+    replica_actions = ('list',)
     queryset = User.objects.all()
     serializer_class = UserSerializer
     pagination_class = CustomPagination
@@ -68,15 +169,19 @@ class CustomUserViewSet(UserViewSet):
                 context={'request': request, 'author': author}
             )
             if serializer.is_valid(raise_exception=True):
-                serializer.save(follower=user, author=author)
+                # The feed of the user is filled in the same transaction.
+                with transaction.atomic():
+                    serializer.save(follower=user, author=author)
                 message = gtl('Subscription successfully created')
                 status_code = status.HTTP_201_CREATED
             else:
                 message = gtl('Object not found')
                 status_code = status.HTTP_404_NOT_FOUND
         else:
-            if Follow.objects.filter(follower=user, author=author).exists():
-                Follow.objects.get(follower=user, author=author).delete()
+            deleted, _ = Follow.objects.filter(
+                follower=user, author=author
+            ).delete()
+            if deleted:
                 message = gtl('Successful unsubscription')
                 status_code = status.HTTP_204_NO_CONTENT
             else:
@@ -88,7 +193,27 @@ class CustomUserViewSet(UserViewSet):
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = self.request.user
-        queryset = Follow.objects.filter(follower=user)
+        recipes = Recipe.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        if limit and limit.isdigit() and int(limit) > 0:
+            recipes = recipes.filter(
+                pk__in=Subquery(
+                    Recipe.objects.filter(
+                        author=OuterRef('author')
+                    ).values('pk')[:int(limit)]
+                )
+            )
+        queryset = Follow.objects.filter(
+            follower=user
+        ).select_related('author').prefetch_related(
+            Prefetch(
+                'author__recipe_set',
+                queryset=recipes,
+                to_attr='preview_recipes'
+            )
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        )
         pages = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             pages, many=True,
@@ -97,14 +222,16 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, ReferenceDataMixin,
+                 viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, ReferenceDataMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
@@ -112,8 +239,17 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     search_fields = ('^name',)
 
+    def list_response(self, request, *args, **kwargs):
+        query = (
+            request.query_params.get('name')
+            or request.query_params.get('search')
+        )
+        if query:
+            return Response(ingredient_index.search(query))
+        return super().list_response(request, *args, **kwargs)
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     pagination_class = CustomPagination
@@ -121,11 +257,131 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return super().list(request, *args, **kwargs)
+
+        key = cache.feed_key(request)
+        data = cache.get_cache().get(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.get_cache().set(
+                key, data, settings.RECIPE_FEED_CACHE_TIMEOUT
+            )
+        return Response(data)
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.all()
+        if self.action not in (
+            'list', 'trending', 'feed', 'match', 'similar'
+        ):
+            queryset = queryset.prefetch_related(
+                'tags', 'recipe_ingredients__ingredient'
+            )
+        if user.is_anonymous:
+            return queryset.select_related('author').annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=Exists(
+                        Follow.objects.filter(
+                            follower=user, author=OuterRef('pk')
+                        )
+                    )
+                )
+            )
+        ).annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(
+                    author=user, recipe=OuterRef('pk')
+                )
+            ),
+        )
+
     def get_serializer_class(self):
-        if self.action == 'create':
+        if self.action in ('create', 'update', 'partial_update'):
             return RecipeCreateSerializer
         return RecipeSerializer
 
+    @action(detail=False)
+    def trending(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).order_by(
+            '-trending_score', '-id'
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=[IsAuthenticated])
+    def feed(self, request):
+        queryset = feed.filter_feed(
+            self.filter_queryset(self.get_queryset()), request.user
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False)
+    def match(self, request):
+        ingredient_ids = [
+            value.strip()
+            for param in request.query_params.getlist('ingredients')
+            for value in param.split(',') if value.strip()
+        ]
+        if not ingredient_ids or not all(
+            value.isdigit() for value in ingredient_ids
+        ):
+            return Response(
+                {'ingredients': gtl('Pass a list of ingredient ids.')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        matches = pantry_index.match(map(int, ingredient_ids))
+        page = self.paginate_queryset(matches)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        page = [item for item in page if item[0] in recipes]
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _, _ in page], many=True
+        )
+        data = serializer.data
+        for item, (_, coverage, missing) in zip(data, page):
+            item['coverage'] = round(coverage, 4)
+            item['missing'] = missing
+        return self.get_paginated_response(data)
+
+    @action(detail=True)
+    def similar(self, request, pk=None):
+        recipe = get_object_or_404(Recipe, id=pk)
+        limit = request.query_params.get('limit', '')
+        if not limit.isdigit() or int(limit) < 1:
+            limit = settings.SIMILAR_RECIPES_LIMIT
+        limit = min(int(limit), settings.SIMILAR_RECIPES_MAX_LIMIT)
+        similar = similarity_index.similar(recipe.pk, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _ in similar]
+        )
+        similar = [item for item in similar if item[0] in recipes]
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, _ in similar], many=True
+        )
+        data = serializer.data
+        for item, (_, similarity) in zip(data, similar):
+            item['similarity'] = round(similarity, 4)
+        return Response(data)
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -136,7 +392,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if request.method == 'POST':
-            created = ShoppingCart.objects.get_or_create(
+            _, created = ShoppingCart.objects.get_or_create(
                 author=user, recipe=recipe
             )
             if created:
@@ -174,7 +430,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         user = self.request.user
 
         if request.method == 'POST':
-            created = Favorite.objects.get_or_create(user=user, recipe=recipe)
+            _, created = Favorite.objects.get_or_create(
+                user=user, recipe=recipe
+            )
             if created:
                 return Response(
                     {'message': gtl('Recipe added to favorite.')},
@@ -200,37 +458,44 @@ class RecipeViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-    @action(detail=False, permission_classes=[IsAuthenticated])
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        renderer_classes=(TextRenderer, CSVRenderer, PDFRenderer)
+    )
     def download_shopping_cart(self, request):
-        author = User.objects.get(id=self.request.user.pk)
-        if author.shopping_cart.exists():
-            ingredients = RecipeIngredient.objects.filter(
-                recipe__shopping_cart__author=author
-            ).values(
-                'ingredient__name',
-                'ingredient__measurement_unit'
-            ).annotate(
-                amounts=Sum('amount', distinct=True)
-            ).order_by('amounts')
-
-            today = date.today().strftime("%d-%m-%Y")
-            shopping_list = f'Список покупок на: {today}\n\n'
-
-            for ingredient in ingredients:
-                shopping_list += (
-                    f'{ingredient["ingredient__name"]} - '
-                    f'{ingredient["amounts"]} '
-                    f'{ingredient["ingredient__measurement_unit"]}\n'
-                )
+        items = ShoppingListItem.objects.filter(user=request.user)
+        amounts = items.order_by('ingredient_id').values_list(
+            'ingredient_id', 'amount'
+        )
+        if not amounts:
+            return Response(
+                gtl('The shopping list is empty.'),
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-            filename = 'shopping_list.txt'
+        today = date.today().strftime("%d-%m-%Y")
+        export_format = request.accepted_renderer.format
+        etag = quote_etag(
+            f'{export_format}-{shopping_list_etag(amounts, today)}'
+        )
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
 
-            response = HttpResponse(shopping_list, content_type='text/plain')
-            response['Content-Disposition'] = (
-                f'attachment; filename={filename}'
-            )
-            return response
-        return Response(
-            gtl('The shopping list is empty.'),
-            status=status.HTTP_404_NOT_FOUND
+        ingredients = items.order_by('ingredient__name').values_list(
+            'ingredient__name',
+            'ingredient__measurement_unit',
+            'amount'
+        ).iterator()
+        response = StreamingHttpResponse(
+            EXPORTERS[export_format](
+                f'Список покупок на: {today}', ingredients
+            ),
+            content_type=request.accepted_media_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping_list.{export_format}'
         )
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,10 @@
+from django.urls import include, path
+
+from . import urls
+
+# The ASGI application serves read-heavy API routes from async views and
+# falls back to the WSGI routes for everything else.
+urlpatterns = [
+    path('api/', include('api.asgi_urls')),
+    *urls.urlpatterns,
+]
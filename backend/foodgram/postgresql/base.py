@@ -0,0 +1,173 @@
+import threading
+
+import psycopg2
+from django.db.backends.postgresql import base
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def close_pools():
+    """Close the idle connections of every pool and forget the pools."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.clear()
+
+
+class ConnectionPool:
+    """Bounded set of open connections shared by the threads of a process.
+
+    A thread waits up to `timeout` seconds for a free connection. Reused
+    connections are checked with SELECT 1 first when `check` is set.
+    """
+
+    def __init__(self, size, timeout, check):
+        self.size = size
+        self.timeout = timeout
+        self.check = check
+        self._idle = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def get(self, connect):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise psycopg2.OperationalError(
+                f'No free database connection in the pool of {self.size} '
+                f'after {self.timeout} s.'
+            )
+        try:
+            while True:
+                with self._lock:
+                    connection = self._idle.pop() if self._idle else None
+                if connection is None:
+                    return connect()
+                if self.is_usable(connection):
+                    return connection
+                connection.close()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def put(self, connection):
+        try:
+            if (
+                not connection.closed
+                and connection.get_transaction_status()
+                != TRANSACTION_STATUS_IDLE
+            ):
+                connection.rollback()
+        except psycopg2.Error:
+            connection.close()
+        if not connection.closed:
+            with self._lock:
+                self._idle.append(connection)
+        self._slots.release()
+
+    def discard(self, connection):
+        connection.close()
+        self._slots.release()
+
+    def is_usable(self, connection):
+        if connection.closed:
+            return False
+        if not self.check:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            return False
+        return True
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL backend with health checks and an optional pool.
+
+    With CONN_HEALTH_CHECKS a persistent connection is checked before its
+    first query in every request, as in Django 4.1, so a connection
+    dropped by the server fails over to a new one instead of failing the
+    request. With POOL['SIZE'] connections are taken from and given back
+    to a pool shared by the threads of the process instead of being
+    opened and closed; CONN_MAX_AGE then decides when a thread gives its
+    connection back.
+    """
+
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool(self):
+        size = self.settings_dict.get('POOL', {}).get('SIZE')
+        if not size:
+            return None
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = ConnectionPool(
+                    size,
+                    self.settings_dict['POOL'].get('TIMEOUT', 10),
+                    self.health_check_enabled
+                )
+            return _pools[self.alias]
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        connection = pool.get(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        pool = self.pool
+        if pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            if self.in_atomic_block:
+                # The wrapper keeps referencing a connection closed inside
+                # an atomic block, so it must not go to another thread.
+                pool.discard(self.connection)
+            else:
+                pool.put(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
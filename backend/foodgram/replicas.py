@@ -0,0 +1,103 @@
+import asyncio
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.decorators import sync_and_async_middleware
+
+STICKY_KEY = 'replica_sticky:{}'
+FENCE_KEY = 'replica_fence'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_database = ContextVar('read_database', default=None)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias != 'default']
+
+
+def is_sticky(user):
+    """Whether reads must go to the primary, because the user wrote
+    recently or cached data was invalidated recently."""
+    keys = [FENCE_KEY]
+    if user.is_authenticated:
+        keys.append(STICKY_KEY.format(user.pk))
+    return bool(cache.get_many(keys))
+
+
+def stick(user):
+    cache.set(
+        STICKY_KEY.format(user.pk), 1, settings.DB_REPLICA_STICKY_SECONDS
+    )
+
+
+def fence():
+    """Read from the primary for DB_REPLICA_STICKY_SECONDS after cached
+    data is invalidated, so a lagging replica does not refill it."""
+    if replica_aliases():
+        cache.set(FENCE_KEY, 1, settings.DB_REPLICA_STICKY_SECONDS)
+
+
+@contextmanager
+def read_from_replica():
+    """Send the reads of the block to a random replica, if there is one."""
+    aliases = replica_aliases()
+    token = _read_database.set(random.choice(aliases) if aliases else None)
+    try:
+        yield
+    finally:
+        _read_database.reset(token)
+
+
+class ReplicaRouter:
+    """Reads go to a replica inside read_from_replica(), all else to
+    the primary. Replicas get their schema and data by replication."""
+
+    def db_for_read(self, model, **hints):
+        return _read_database.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+def stick_writer(request):
+    user = getattr(request, 'user', None)
+    if (
+        request.method not in SAFE_METHODS
+        and user is not None
+        and user.is_authenticated
+        and replica_aliases()
+    ):
+        stick(user)
+
+
+@sync_and_async_middleware
+def replica_stickiness_middleware(get_response):
+    """Keep users on the primary for DB_REPLICA_STICKY_SECONDS after a
+    write, so they read their own writes despite replication lag.
+
+    Async capable, so it does not serialize the requests of an ASGI
+    application into the single thread of synchronous middleware.
+    """
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            response = await get_response(request)
+            if request.method not in SAFE_METHODS:
+                # The user of the session may still have to be loaded.
+                await sync_to_async(stick_writer)(request)
+            return response
+    else:
+        def middleware(request):
+            response = get_response(request)
+            stick_writer(request)
+            return response
+    return middleware
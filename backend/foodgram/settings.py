@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -38,9 +39,10 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram.replicas.replica_stickiness_middleware',
 ]
 
-ROOT_URLCONF = 'foodgram.urls'
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', 'foodgram.urls')
 
 TEMPLATES = [
     {
@@ -61,17 +63,95 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
 
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'foodgram.postgresql',
         'NAME': os.getenv('POSTGRES_DB', 'django'),
         'USER': os.getenv('POSTGRES_USER', 'django'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Pooled connections go back to the pool at the end of a request.
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(
+            os.getenv('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True'
+        ) == 'True',
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        },
+    }
+}
+
+# Comma-separated host[:port] of streaming replicas of the default database.
+for number, replica in enumerate(filter(None, os.getenv(
+    'DB_REPLICA_HOSTS', ''
+).split(','))):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # Tests read the replica through the connection of the primary.
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+# Reads stay on the primary this long after a write of the user or a cache
+# invalidation, so it has to exceed the replication lag.
+DB_REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# Per-process LRU of authenticated tokens. A shared cache, such as the
+# default one with REDIS_URL, also forgets logged out tokens in other
+# workers at once instead of after TOKEN_AUTH_CACHE_TIMEOUT.
+CACHES['auth_tokens'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'auth_tokens',
+    'OPTIONS': {
+        'MAX_ENTRIES': int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 10000)),
+    },
+}
+TOKEN_AUTH_CACHE = os.getenv(
+    'TOKEN_AUTH_CACHE', 'default' if os.getenv('REDIS_URL') else 'auth_tokens'
+)
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.getenv('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+
+RECIPE_FEED_CACHE = 'default'
+RECIPE_FEED_CACHE_TIMEOUT = int(os.getenv('RECIPE_FEED_CACHE_TIMEOUT', 60))
+RECIPE_FRAGMENT_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FRAGMENT_CACHE_TIMEOUT', 600)
+)
+
+APPROXIMATE_COUNT_THRESHOLD = int(
+    os.getenv('APPROXIMATE_COUNT_THRESHOLD', 1000)
+)
+APPROXIMATE_COUNT_TIMEOUT = int(os.getenv('APPROXIMATE_COUNT_TIMEOUT', 300))
+
+TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', 7))
+TRENDING_FAVORITE_WEIGHT = float(os.getenv('TRENDING_FAVORITE_WEIGHT', 1))
+TRENDING_CART_WEIGHT = float(os.getenv('TRENDING_CART_WEIGHT', 2))
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+
+RECIPE_SEARCH_CONFIG = 'russian'
+RECIPE_SEARCH_FALLBACK_LIMIT = 1000
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -103,6 +183,28 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static_backend')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+SHOPPING_LIST_FONT = os.getenv('SHOPPING_LIST_FONT', 'DejaVuSans.ttf')
+
+RECIPE_IMAGE_MAX_SIZE = 1600
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', 2))
+
+REFERENCE_DATA_MAX_AGE = int(os.getenv('REFERENCE_DATA_MAX_AGE', 600))
+REFERENCE_DATA_CACHE_TIMEOUT = int(
+    os.getenv('REFERENCE_DATA_CACHE_TIMEOUT', 86400)
+)
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+PANTRY_INDEX_TTL = int(os.getenv('PANTRY_INDEX_TTL', 3600))
+PANTRY_INDEX_MAX_CHANGES = int(os.getenv('PANTRY_INDEX_MAX_CHANGES', 500))
+SIMILAR_RECIPES_TAG_WEIGHT = 0.5
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_RECIPES_MAX_LIMIT = 50
+SIMILAR_RECIPES_MATRIX_DIR = os.getenv(
+    'SIMILAR_RECIPES_MATRIX_DIR', os.path.join(BASE_DIR, 'similarity')
+)
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -111,7 +213,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
@@ -1,6 +1,8 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
+from recipes import images, search, shopping_list
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart, Tag)
 
@@ -19,16 +21,60 @@ class TagAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 
+class AuthorEmailFilter(admin.SimpleListFilter):
+    """Author filter typed as an email instead of a list of every author."""
+    title = _('author')
+    parameter_name = 'author_email'
+    template = 'admin/recipes/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'parameter_name': self.parameter_name,
+            'value': self.value(),
+            'params': {
+                name: value for name, value in changelist.params.items()
+                if name != self.parameter_name
+            },
+        }
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author__email=self.value().strip())
+        return queryset
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientInline, )
     list_display = (
         'id', 'name', 'text',
         'cooking_time', 'get_tags', 'get_ingredients', 'get_favorite_count')
-    search_fields = (
-        'name', 'cooking_time', 'tags__name',
-        'author__email', 'ingredients__name')
-    list_filter = ('tags', 'author', 'name')
+    search_fields = ('name', 'author__email')
+    list_filter = ('tags', AuthorEmailFilter)
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related(
+            'tags', 'ingredients'
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """Search by author email or through the full-text index.
+
+        Both avoid joining tags and ingredients, so no DISTINCT is needed.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        if '@' in search_term:
+            return queryset.filter(author__email=search_term), False
+        return search.search(queryset, search_term), False
 
     def get_tags(self, obj):
         return ', '.join([tag.name for tag in obj.tags.all()])
@@ -39,15 +85,30 @@ class RecipeAdmin(admin.ModelAdmin):
         )
 
     def get_favorite_count(self, obj):
-        return obj.favorite_recipes.count()
+        return obj.favorites_count
 
     def save_model(self, request, obj, form, change):
         if obj.ingredients.count() == 0:
             raise admin.ValidationError(
                 "Рецепт должен содержать хотя бы один ингредиент!"
             )
+        image_changed = 'image' in form.changed_data
+        if image_changed:
+            obj.image = images.store(obj.image)
+            obj.image_widths = []
         super().save_model(request, obj, form, change)
         obj.save()
+        if image_changed:
+            images.schedule(obj)
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = shopping_list.recipe_amounts(recipe) if change else {}
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_list.change_recipe(
+                recipe, old_amounts, shopping_list.recipe_amounts(recipe)
+            )
 
 
 class IngredientResource(resources.ModelResource):
@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from users.models import Follow, User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+RECIPE_COUNTERS = {
+    'favorites_count': (Favorite, 'recipe'),
+    'in_carts_count': (ShoppingCart, 'recipe'),
+}
+USER_COUNTERS = {
+    'recipes_count': (Recipe, 'author'),
+    'followers_count': (Follow, 'author'),
+}
+
+
+def increment(model, pk, field, delta=1):
+    """Atomically shift a denormalized counter, never below zero."""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def count_subquery(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def recount(model, counters):
+    """Recompute the counters from scratch, return the number of fixed rows."""
+    fixed = 0
+    for field, (related_model, related_field) in counters.items():
+        queryset = model.objects.annotate(
+            actual=count_subquery(related_model, related_field)
+        ).exclude(**{field: F('actual')})
+        pks = list(queryset.values_list('pk', flat=True))
+        model.objects.filter(pk__in=pks).update(
+            **{field: count_subquery(related_model, related_field)}
+        )
+        fixed += len(pks)
+    return fixed
+
+
+def recount_all():
+    return recount(Recipe, RECIPE_COUNTERS) + recount(User, USER_COUNTERS)
@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from users.models import Follow, User
+
+from .models import FeedEntry, Recipe
+
+# Recipes of an author with up to FEED_FANOUT_LIMIT followers are written
+# into the feed of every follower when published. Recipes of more popular
+# authors are not copied, the feed reads them from Recipe instead.
+
+
+def is_popular(followers_count):
+    return followers_count > settings.FEED_FANOUT_LIMIT
+
+
+def followers_count(author_id):
+    return User.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def push(user_ids, recipe_ids):
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in recipe_ids
+        ),
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def fan_out(recipe_id, author_id):
+    """Add a new recipe to the feeds of the author's followers."""
+    if not is_popular(followers_count(author_id)):
+        push(
+            Follow.objects.filter(
+                author_id=author_id
+            ).values_list('follower_id', flat=True),
+            [recipe_id]
+        )
+
+
+def backfill(user_id, author_id):
+    """Add the recipes of a new subscription to the feed of the user."""
+    if not is_popular(followers_count(author_id)):
+        push(
+            [user_id],
+            Recipe.objects.filter(
+                author_id=author_id
+            ).values_list('pk', flat=True)
+        )
+
+
+def prune(user_id, author_id):
+    """Drop the recipes of an ended subscription from the user's feed.
+
+    The author may have stopped being popular with it, then the recipes
+    published meanwhile are copied to the remaining followers.
+    """
+    FeedEntry.objects.filter(
+        user_id=user_id, recipe__author_id=author_id
+    ).delete()
+    if followers_count(author_id) == settings.FEED_FANOUT_LIMIT:
+        backfill_followers(author_id)
+
+
+def backfill_followers(author_id):
+    """Copy every recipe of an author who is no longer popular.
+
+    Recipes published while the author was read on the fly have no feed
+    entries yet.
+    """
+    push(
+        Follow.objects.filter(
+            author_id=author_id
+        ).values_list('follower_id', flat=True),
+        list(Recipe.objects.filter(
+            author_id=author_id
+        ).values_list('pk', flat=True))
+    )
+
+
+def filter_feed(queryset, user):
+    """Recipes of the authors the user follows."""
+    condition = Q(pk__in=FeedEntry.objects.filter(
+        user=user
+    ).values('recipe_id'))
+    popular = list(Follow.objects.filter(
+        follower=user,
+        author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if popular:
+        condition |= Q(author_id__in=popular)
+    return queryset.filter(condition)
+
+
+def rebuild():
+    """Recreate every feed from the subscriptions."""
+    with transaction.atomic():
+        FeedEntry.objects.all().delete()
+        entries = FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(user_id=follower_id, recipe_id=recipe_id)
+                for follower_id, recipe_id in Follow.objects.filter(
+                    author__followers_count__lte=settings.FEED_FANOUT_LIMIT
+                ).exclude(author__recipe=None).values_list(
+                    'follower_id', 'author__recipe'
+                ).iterator()
+            ),
+            batch_size=1000
+        )
+    return len(entries)
@@ -0,0 +1,144 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Sent with the image name and recipe ids once the variants are stored.
+variants_ready = Signal()
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def encode(image, image_format, **options):
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def normalize(file):
+    """Upright, downscaled copy of an upload as (name, bytes).
+
+    The name is derived from the content, so equal images share a file.
+    """
+    image = ImageOps.exif_transpose(Image.open(file))
+    size = settings.RECIPE_IMAGE_MAX_SIZE
+    image.thumbnail((size, size))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image_format, extension = 'PNG', 'png'
+        data = encode(image, image_format, optimize=True)
+    else:
+        image_format, extension = 'JPEG', 'jpg'
+        data = encode(
+            image.convert('RGB'), image_format,
+            quality=settings.RECIPE_IMAGE_QUALITY, optimize=True
+        )
+    digest = hashlib.sha256(data).hexdigest()
+    return f'recipes/{digest[:2]}/{digest}.{extension}', data
+
+
+def save(name, data):
+    """Save content under its own name unless it is stored already."""
+    if default_storage.exists(name):
+        return
+    saved = default_storage.save(name, ContentFile(data))
+    if saved != name:
+        # Saved concurrently with the same content by another worker.
+        default_storage.delete(saved)
+
+
+def store(file):
+    """Save a normalized upload and return its content-addressed name."""
+    name, data = normalize(file)
+    save(name, data)
+    return name
+
+
+def variant_name(name, width):
+    return f'{os.path.splitext(name)[0]}_{width}.webp'
+
+
+def generate_variants(name, recipe_ids):
+    """Store WebP variants of an image and list them on the recipes."""
+    with default_storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    widths = [
+        width for width in settings.RECIPE_IMAGE_WIDTHS if width < image.width
+    ] + [image.width]
+    for width in widths:
+        variant = variant_name(name, width)
+        if default_storage.exists(variant):
+            continue
+        resized = image.copy()
+        resized.thumbnail((width, image.height))
+        save(variant, encode(
+            resized, 'WEBP', quality=settings.RECIPE_IMAGE_QUALITY
+        ))
+
+    # The image may have been replaced while the variants were generated.
+    Recipe.objects.filter(pk__in=recipe_ids, image=name).update(
+        image_widths=widths
+    )
+    variants_ready.send(sender=Recipe, name=name, recipe_ids=recipe_ids)
+    return widths
+
+
+def run(name, recipe_ids):
+    try:
+        generate_variants(name, recipe_ids)
+    except Exception:
+        logger.exception('Could not generate variants of %s', name)
+    finally:
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images'
+            )
+    return _executor
+
+
+def schedule(recipe):
+    """Generate image variants in the worker pool after the commit.
+
+    With RECIPE_IMAGE_WORKERS set to 0 they are generated in place.
+    """
+    name, recipe_ids = recipe.image.name, [recipe.pk]
+    if settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run, name, recipe_ids)
+        )
+    else:
+        transaction.on_commit(lambda: generate_variants(name, recipe_ids))
+
+
+def srcset(recipe):
+    """(url, width) of every stored variant of the recipe image."""
+    if not recipe.image:
+        return []
+    return [
+        (default_storage.url(variant_name(recipe.image.name, width)), width)
+        for width in recipe.image_widths
+    ]
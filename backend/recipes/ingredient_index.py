@@ -0,0 +1,89 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Ingredient
+
+VERSION_KEY = 'ingredient_index_version'
+WORD_START = re.compile(r'(?:^|[\s\-(,])(?=\w)')
+
+
+def normalize(value):
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class IngredientIndex:
+    """Process-local sorted index of ingredient names for autocomplete.
+
+    Every word start of every name is kept as a sorted key, so a prefix
+    lookup is a binary search. The index is rebuilt lazily after a signal
+    bumps the shared version or after INGREDIENT_INDEX_TTL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []
+        self._entries = []
+        self._version = None
+        self._built_at = 0.0
+
+    def invalidate(self):
+        self._version = None
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+
+    def _is_fresh(self):
+        return (
+            self._version is not None
+            and self._version == cache.get(VERSION_KEY, 0)
+            and time.monotonic() - self._built_at
+            < settings.INGREDIENT_INDEX_TTL
+        )
+
+    def _build(self):
+        version = cache.get(VERSION_KEY, 0)
+        entries = []
+        for ingredient in Ingredient.objects.values(
+            'id', 'name', 'measurement_unit'
+        ):
+            name = normalize(ingredient['name'])
+            for match in WORD_START.finditer(name):
+                start = match.end()
+                entries.append((name[start:], start == 0, name, ingredient))
+        entries.sort(key=lambda entry: entry[0])
+        self._keys = [entry[0] for entry in entries]
+        self._entries = entries
+        self._version = version
+        self._built_at = time.monotonic()
+
+    def search(self, query):
+        """Ingredients matching the query: exact, name prefix, word prefix."""
+        query = normalize(query)
+        if not self._is_fresh():
+            with self._lock:
+                if not self._is_fresh():
+                    self._build()
+        keys, entries = self._keys, self._entries
+
+        found = {}
+        position = bisect_left(keys, query)
+        while position < len(keys) and keys[position].startswith(query):
+            _, name_start, name, ingredient = entries[position]
+            rank = 0 if name == query else 1 if name_start else 2
+            if rank < found.get(ingredient['id'], (3,))[0]:
+                found[ingredient['id']] = (rank, name, ingredient)
+            position += 1
+        return [
+            ingredient for _, _, ingredient in sorted(
+                found.values(), key=lambda item: item[:2]
+            )
+        ]
+
+
+ingredient_index = IngredientIndex()
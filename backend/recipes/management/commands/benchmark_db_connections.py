@@ -0,0 +1,94 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from foodgram.postgresql.base import close_pools
+from recipes.models import Recipe, Tag
+
+# (label, CONN_MAX_AGE, CONN_HEALTH_CHECKS, pooled)
+MODES = (
+    ('new connection per request', 0, False, False),
+    ('persistent connections', 60, False, False),
+    ('persistent connections with health checks', 60, True, False),
+    ('pool with health checks', 0, True, True),
+)
+
+
+def request():
+    """Queries of a small read request between the request signals."""
+    close_old_connections()
+    list(Tag.objects.all())
+    list(Recipe.objects.order_by('-id').values_list('id', 'name')[:6])
+    close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-request latency with a new database connection per '
+        'request, persistent connections and the connection pool'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='Threads sending requests, also the size of the pool.'
+        )
+
+    def handle(self, *args, **options):
+        settings_dict = connections['default'].settings_dict
+        keys = ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'POOL')
+        saved = {key: settings_dict.get(key) for key in keys}
+        can_pool = settings_dict['ENGINE'] == 'foodgram.postgresql'
+        try:
+            for label, max_age, health_checks, pooled in MODES:
+                if pooled and not can_pool:
+                    self.stdout.write(f'{label}: needs foodgram.postgresql')
+                    continue
+                connections.close_all()
+                settings_dict.update(zip(keys, (
+                    max_age,
+                    health_checks,
+                    {'SIZE': options['threads'] if pooled else 0},
+                )))
+                self.report(label, self.run(options))
+        finally:
+            connections.close_all()
+            settings_dict.update(saved)
+            close_pools()
+
+    def run(self, options):
+        timings = []
+        per_thread = options['requests'] // options['threads']
+
+        def worker():
+            for _ in range(per_thread):
+                started = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - started) * 1000)
+            connections.close_all()
+
+        # Warm up, so the first connection of a mode is not measured.
+        request()
+        threads = [
+            threading.Thread(target=worker)
+            for _ in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return timings
+
+    def report(self, label, timings):
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}, {len(timings)} requests: '
+            f'median {statistics.median(timings):.2f} ms, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, '
+            f'max {timings[-1]:.2f} ms'
+        ))
@@ -0,0 +1,124 @@
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.pantry import PantryIndex
+from recipes.similarity import (SimilarityIndex, SimilarityMatrix, pairs,
+                                publish)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the ingredient matcher index on synthetic data: build '
+        'time, ranking a page of matches and finding similar recipes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--per-recipe',
+            type=int,
+            default=10,
+            help='Ingredients in every synthetic recipe.'
+        )
+        parser.add_argument(
+            '--pantry',
+            type=int,
+            default=15,
+            help='Ingredients in every query.'
+        )
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        per_recipe = options['per_recipe']
+        recipes = options['rows'] // per_recipe
+        # Popular ingredients are far more common, as in real recipes.
+        weights = [1 / rank for rank in range(1, options['ingredients'] + 1)]
+        ingredient_ids = range(1, options['ingredients'] + 1)
+
+        def rows():
+            for recipe_id in range(1, recipes + 1):
+                for ingredient_id in set(rng.choices(
+                    ingredient_ids, weights, k=per_recipe
+                )):
+                    yield ingredient_id, recipe_id
+
+        def tag_rows():
+            for recipe_id in range(1, recipes + 1):
+                for tag_id in rng.sample(range(1, 11), rng.randint(1, 3)):
+                    yield tag_id, recipe_id
+
+        ingredient_rows = list(rows())
+        index = PantryIndex()
+        started = time.perf_counter()
+        index.load(ingredient_rows)
+        built = time.perf_counter() - started
+        self.stdout.write(
+            f'Indexed {recipes} recipes, '
+            f'{sum(map(len, index._recipes.values()))} rows in {built:.2f}s'
+        )
+
+        timings = []
+        found = 0
+        for _ in range(options['queries']):
+            pantry = rng.choices(
+                ingredient_ids, weights, k=options['pantry']
+            )
+            started = time.perf_counter()
+            matches = index.match(pantry, refresh=False)
+            matches[:options['page_size']]
+            found += len(matches)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.report(
+            f'match: {found / options["queries"]:.0f} matches on average',
+            timings
+        )
+
+        directory = tempfile.mkdtemp()
+        try:
+            started = time.perf_counter()
+            path = publish(SimilarityMatrix.build(
+                pairs(
+                    (recipe_id, ingredient_id)
+                    for ingredient_id, recipe_id in ingredient_rows
+                ),
+                pairs(
+                    (recipe_id, tag_id) for tag_id, recipe_id in tag_rows()
+                )
+            ), directory)
+            built = time.perf_counter() - started
+            similarity = SimilarityIndex(directory)
+            started = time.perf_counter()
+            similarity._load(path)
+            loaded = time.perf_counter() - started
+            self.stdout.write(
+                f'Built and saved the similarity matrix in {built:.2f}s, '
+                f'mapped it in {loaded * 1000:.1f} ms'
+            )
+            timings = []
+            for _ in range(options['queries']):
+                recipe_id = rng.randint(1, recipes)
+                started = time.perf_counter()
+                similarity.similar(
+                    recipe_id, options['page_size'], refresh=False
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+            self.report('similar', timings)
+        finally:
+            shutil.rmtree(directory)
+
+    def report(self, label, timings):
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}, {len(timings)} queries: '
+            f'median {statistics.median(timings):.1f} ms, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, '
+            f'max {timings[-1]:.1f} ms'
+        ))
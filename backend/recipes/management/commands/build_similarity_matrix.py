@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the similar recipes matrix shared by the worker processes, '
+        'changes made since are applied incrementally until the next build'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--directory',
+            default=settings.SIMILAR_RECIPES_MATRIX_DIR,
+            help='Defaults to the SIMILAR_RECIPES_MATRIX_DIR setting.'
+        )
+
+    def handle(self, *args, **options):
+        matrix = similarity.build_matrix()
+        similarity.publish(matrix, options['directory'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(matrix.recipe_ids)} recipes, '
+            f'{len(matrix.row_indices)} ingredients and tags'
+        ))
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from users.models import Follow, User
+
+
+def queries(user, recipe, ingredient):
+    """Hot queries of the viewsets, as (title, queryset)."""
+    prefix = ingredient.name[:3]
+    return (
+        ('RecipeViewSet.list with user flags', Recipe.objects.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(
+                    author=user, recipe=OuterRef('pk')
+                )
+            ),
+        )[:6]),
+        ('RecipeViewSet.list ?author=',
+         Recipe.objects.filter(author=recipe.author_id)[:6]),
+        ('RecipeViewSet.list ?is_favorited=1',
+         Recipe.objects.filter(favorite_recipes__user=user)[:6]),
+        ('RecipeViewSet.list ?is_in_shopping_cart=1',
+         Recipe.objects.filter(shopping_cart__author=user)[:6]),
+        ('RecipeViewSet.retrieve ingredients',
+         RecipeIngredient.objects.filter(recipe=recipe)),
+        ('RecipeViewSet.shopping_cart carts holding a recipe',
+         ShoppingCart.objects.filter(recipe=recipe).values('author_id')),
+        ('Recipe counters: favorites of a recipe',
+         Favorite.objects.filter(recipe=recipe).values('user_id')),
+        ('Ingredient edits: recipes using an ingredient',
+         RecipeIngredient.objects.filter(
+             ingredient=ingredient
+         ).values('recipe_id')),
+        ('CustomUserViewSet.subscriptions',
+         Follow.objects.filter(follower=user)[:6]),
+        ('CustomUserViewSet.subscribe feed fan-out',
+         Follow.objects.filter(author=user).values('follower_id')),
+        ('IngredientViewSet.list ?name= prefix',
+         Ingredient.objects.filter(name__startswith=prefix)),
+        ('Ingredient admin search',
+         Ingredient.objects.filter(name__icontains=prefix[1:])),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Print the query plans of the hot viewset queries, to compare '
+        'them before and after a migration'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Run the queries (EXPLAIN ANALYZE on PostgreSQL).'
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by('-followers_count').first()
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        ingredient = Ingredient.objects.first()
+        if None in (user, recipe, ingredient):
+            raise CommandError(
+                'Needs at least a user, a recipe and an ingredient.'
+            )
+
+        explain = {'analyze': True} if options['analyze'] else {}
+        for title, queryset in queries(user, recipe, ingredient):
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain(**explain))
+            self.stdout.write('')
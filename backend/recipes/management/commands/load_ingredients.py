@@ -0,0 +1,157 @@
+import csv
+import json
+import time
+from io import StringIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes import reference_data
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Decode the objects of a top-level JSON array one by one."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        buffer = buffer.lstrip().lstrip('[,').lstrip()
+        while buffer and buffer[0] != ']':
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            yield item['name'], item['measurement_unit']
+            buffer = buffer[end:].lstrip().lstrip(',').lstrip()
+        if not chunk:
+            return
+        buffer += chunk
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def clean(rows):
+    for name, measurement_unit in rows:
+        name, measurement_unit = name.strip(), measurement_unit.strip()
+        if name and measurement_unit:
+            yield name, measurement_unit
+
+
+class CopyBuffer:
+    """File-like object feeding rows to COPY without materializing them."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+        self.buffer = ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            line = StringIO()
+            csv.writer(line).writerow(row)
+            self.buffer += line.getvalue()
+            self.count += 1
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class Command(BaseCommand):
+    help = 'Bulk load ingredients from a CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to ingredients.csv or .json')
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='File format, guessed from the extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per bulk_create batch when COPY is not available.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in READERS:
+            raise CommandError(f'Unknown file format: {file_format}')
+
+        started = time.monotonic()
+        with open(path, encoding='utf-8') as file:
+            rows = clean(READERS[file_format](file))
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    read, created = self.copy(rows)
+                else:
+                    read, created = self.bulk_create(
+                        rows, options['batch_size']
+                    )
+        ingredient_index.invalidate()
+        reference_data.bump(Ingredient)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {read} rows, created {created} ingredients '
+            f'in {elapsed:.2f}s ({read / elapsed:.0f} rows/s)'
+        ))
+
+    def copy(self, rows):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        buffer = CopyBuffer(rows)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_staging '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_staging (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT staging.name, staging.measurement_unit '
+                'FROM ingredient_staging staging '
+                f'WHERE NOT EXISTS (SELECT 1 FROM {table} ingredient '
+                'WHERE ingredient.name = staging.name '
+                'AND ingredient.measurement_unit = staging.measurement_unit)'
+            )
+            return buffer.count, cursor.rowcount
+
+    def bulk_create(self, rows, batch_size):
+        seen = set(Ingredient.objects.values_list('name', 'measurement_unit'))
+        read = created = 0
+        batch = []
+        for row in rows:
+            read += 1
+            if row in seen:
+                continue
+            seen.add(row)
+            batch.append(Ingredient(name=row[0], measurement_unit=row[1]))
+            if len(batch) >= batch_size:
+                Ingredient.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        Ingredient.objects.bulk_create(batch)
+        return read, created + len(batch)
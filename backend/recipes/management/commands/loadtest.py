@@ -0,0 +1,88 @@
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Send concurrent GET requests to a running server and report '
+        'throughput and latency, to compare the WSGI and ASGI modes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Server root, e.g. http://localhost')
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Path to request, repeatable. Read endpoints by default.'
+        )
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--token', help='Auth token of the user.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, *args, **options):
+        url = options['url'].rstrip('/')
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        timeout = options['timeout']
+
+        def fetch(path):
+            started = time.perf_counter()
+            try:
+                with urlopen(
+                    Request(url + path, headers=headers), timeout=timeout
+                ) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as error:
+                status = error.code
+            except (URLError, OSError) as error:
+                status = type(error).__name__
+            return path, status, time.perf_counter() - started
+
+        paths = options['paths'] or DEFAULT_PATHS
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(
+                fetch, islice(cycle(paths), options['requests'])
+            ))
+        elapsed = time.perf_counter() - started
+
+        statuses = Counter(status for _, status, _ in results)
+        self.stdout.write(
+            f'{len(results)} requests, concurrency '
+            f'{options["concurrency"]}, {elapsed:.2f}s, '
+            f'{len(results) / elapsed:.1f} requests/s'
+        )
+        self.stdout.write('Statuses: ' + ', '.join(
+            f'{status}: {count}' for status, count in sorted(
+                statuses.items(), key=lambda item: str(item[0])
+            )
+        ))
+        for path in paths:
+            timings = sorted(
+                duration * 1000
+                for result_path, _, duration in results
+                if result_path == path
+            )
+            self.stdout.write(
+                f'{path}: median {statistics.median(timings):.1f} ms, '
+                f'p95 {timings[int(len(timings) * 0.95) - 1]:.1f} ms, '
+                f'max {timings[-1]:.1f} ms'
+            )
@@ -0,0 +1,27 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from recipes import images
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate WebP variants of recipe images that have none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        recipe_ids = defaultdict(list)
+        for recipe_id, name in Recipe.objects.filter(
+            image_widths=[]
+        ).exclude(image='').values_list('pk', 'image').iterator():
+            recipe_ids[name].append(recipe_id)
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            list(executor.map(images.run, recipe_ids, recipe_ids.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(recipe_ids)} images of '
+            f'{sum(map(len, recipe_ids.values()))} recipes'
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recipes import feed
+
+
+class Command(BaseCommand):
+    help = 'Recreate the subscription feeds of every user'
+
+    def handle(self, *args, **options):
+        count = feed.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Created {count} feed entries'))
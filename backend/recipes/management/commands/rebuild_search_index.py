@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} recipes'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes import shopping_list
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Rebuild materialized shopping lists from the shopping carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report rows that differ from the carts, do not write.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = shopping_list.rebuild()
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt {count} shopping list items')
+            )
+            return
+
+        expected = shopping_list.expected_items()
+        actual = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in
+            ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        drift = {
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        }
+        for user_id, ingredient_id in sorted(drift):
+            self.stdout.write(
+                f'user {user_id}, ingredient {ingredient_id}: '
+                f'expected {expected.get((user_id, ingredient_id), 0)}, '
+                f'stored {actual.get((user_id, ingredient_id), 0)}'
+            )
+        if drift:
+            raise CommandError(f'{len(drift)} shopping list items drifted')
+        self.stdout.write(self.style.SUCCESS('Shopping lists are consistent'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = 'Repair denormalized favorite, cart, recipe and follower counters'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = counters.recount_all()
+        self.stdout.write(self.style.SUCCESS(f'Fixed {fixed} counters'))
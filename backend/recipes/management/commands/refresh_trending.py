@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from recipes import trending
+
+
+class Command(BaseCommand):
+    help = 'Recompute trending scores of all recipes from their counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = trending.refresh_all(options['batch_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated {updated} trending scores')
+        )
@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    counters = (
+        (Recipe, 'favorites_count', apps.get_model('recipes', 'Favorite'),
+         'recipe'),
+        (Recipe, 'in_carts_count', apps.get_model('recipes', 'ShoppingCart'),
+         'recipe'),
+        (User, 'recipes_count', Recipe, 'author'),
+        (User, 'followers_count', apps.get_model('users', 'Follow'),
+         'author'),
+    )
+    for model, field, related_model, related_field in counters:
+        model.objects.update(**{field: models.functions.Coalesce(
+            models.Subquery(
+                related_model.objects.filter(
+                    **{related_field: models.OuterRef('pk')}
+                ).order_by().values(related_field).annotate(
+                    total=models.Count('pk')
+                ).values('total')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='favorites count'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='shopping carts count'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
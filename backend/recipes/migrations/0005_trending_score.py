@@ -0,0 +1,45 @@
+# Generated by Django 3.2 on 2026-10-18 20:15
+
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_trending_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    epoch = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    half_life = settings.TRENDING_HALF_LIFE_DAYS * 24 * 60 * 60
+    batch = []
+    for recipe in Recipe.objects.order_by('pk').iterator():
+        recipe.trending_score = math.log2(
+            1
+            + settings.TRENDING_FAVORITE_WEIGHT * recipe.favorites_count
+            + settings.TRENDING_CART_WEIGHT * recipe.in_carts_count
+        ) + (recipe.pub_date - epoch).total_seconds() / half_life
+        batch.append(recipe)
+        if len(batch) >= 1000:
+            Recipe.objects.bulk_update(batch, ['trending_score'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['trending_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='trending score'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-id'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(fill_trending_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 3.2 on 2026-10-18 20:17
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON recipes_recipesearch USING gin (search_vector)'
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+            'name, ingredients, text, '
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+def fill_search_index(apps, schema_editor):
+    # The same documents as recipes.search.index_recipes builds.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'INSERT INTO recipes_recipesearch (recipe_id, search_vector) '
+            'SELECT recipe.id, '
+            "setweight(to_tsvector(%(config)s::regconfig, recipe.name), 'A') "
+            '|| setweight(to_tsvector(%(config)s::regconfig, '
+            "coalesce(string_agg(ingredient.name, ' '), '')), 'B') "
+            "|| setweight(to_tsvector(%(config)s::regconfig, recipe.text), 'C') "
+            'FROM recipes_recipe recipe '
+            'LEFT JOIN recipes_recipeingredient recipe_ingredient '
+            'ON recipe_ingredient.recipe_id = recipe.id '
+            'LEFT JOIN recipes_ingredient ingredient '
+            'ON ingredient.id = recipe_ingredient.ingredient_id '
+            'GROUP BY recipe.id',
+            {'config': settings.RECIPE_SEARCH_CONFIG}
+        )
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            'SELECT recipe.id, recipe.name, '
+            "coalesce(group_concat(ingredient.name, ' '), ''), recipe.text "
+            'FROM recipes_recipe recipe '
+            'LEFT JOIN recipes_recipeingredient recipe_ingredient '
+            'ON recipe_ingredient.recipe_id = recipe.id '
+            'LEFT JOIN recipes_ingredient ingredient '
+            'ON ingredient.id = recipe_ingredient.ingredient_id '
+            'GROUP BY recipe.id'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+    elif schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSearch',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='recipes.recipe', verbose_name='recipe')),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(null=True, verbose_name='search vector')),
+            ],
+            options={
+                'verbose_name': 'recipe search document',
+                'verbose_name_plural': 'recipe search documents',
+            },
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipesearch',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 3.2 on 2026-10-18 20:28
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Fold repeated ingredients of a recipe into one row."""
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = RecipeIngredient.objects.values(
+        'recipe', 'ingredient'
+    ).annotate(
+        rows=models.Count('pk'), total=models.Sum('amount'),
+        keep=models.Min('pk')
+    ).filter(rows__gt=1).order_by()
+    for duplicate in duplicates:
+        RecipeIngredient.objects.filter(
+            recipe=duplicate['recipe'], ingredient=duplicate['ingredient']
+        ).exclude(pk=duplicate['keep']).delete()
+        RecipeIngredient.objects.filter(pk=duplicate['keep']).update(
+            amount=duplicate['total']
+        )
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX ingredient_name_trgm_idx '
+            'ON recipes_ingredient USING gin (name gin_trgm_ops)'
+        )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS ingredient_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['recipe', 'user'], name='favorite_reverse_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['name'], name='ingredient_name_prefix_idx', opclasses=('varchar_pattern_ops',)),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='ingredient',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['name'], name='ingredient_name_trgm_idx', opclasses=('gin_trgm_ops',)),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_trigram_index, drop_trigram_index),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeingredient',
+            index=models.Index(fields=['ingredient', 'recipe'], name='recipeingredient_reverse_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'author'], name='shoppingcart_reverse_idx'),
+        ),
+        migrations.RunPython(merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+    ]
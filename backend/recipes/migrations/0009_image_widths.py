@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_widths',
+            field=models.JSONField(default=list, editable=False, verbose_name='image variant widths'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 from django.utils.translation import gettext_lazy as _
@@ -27,6 +29,18 @@ class Ingredient(models.Model):
         verbose_name = _('Ingredient')
         verbose_name_plural = _('Ingredients')
         ordering = ('name',)
+        indexes = (
+            models.Index(
+                fields=('name',),
+                name='ingredient_name_prefix_idx',
+                opclasses=('varchar_pattern_ops',)
+            ),
+            GinIndex(
+                fields=('name',),
+                name='ingredient_name_trgm_idx',
+                opclasses=('gin_trgm_ops',)
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -62,11 +76,35 @@ class Recipe(models.Model):
         _('publication date'),
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        _('favorites count'), default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        _('shopping carts count'), default=0, editable=False
+    )
+    trending_score = models.FloatField(
+        _('trending score'), default=0, editable=False
+    )
+    image_widths = models.JSONField(
+        _('image variant widths'), default=list, editable=False
+    )
+
+    COUNTER_FIELDS = ('favorites_count', 'in_carts_count', 'trending_score')
 
     class Meta:
         verbose_name = _('Recipe')
         verbose_name_plural = _('Recipes')
         ordering = ('-id',)
+        indexes = (
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_idx'
+            ),
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -97,6 +135,18 @@ class RecipeIngredient(models.Model):
         verbose_name = _('ingredient in recipe')
         verbose_name_plural = _('ingredients in recipe')
         ordering = ('-id',)
+        constraints = (
+            models.UniqueConstraint(
+                name='unique_recipe_ingredient',
+                fields=['recipe', 'ingredient']
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('ingredient', 'recipe'),
+                name='recipeingredient_reverse_idx'
+            ),
+        )
 
     def __str__(self):
         return f'{self.ingredient} {self.amount}'
@@ -123,8 +173,14 @@ class Favorite(models.Model):
             models.UniqueConstraint(
                 name='favorite_recipe',
                 fields=['user', 'recipe']
-            )
-        ),
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favorite_reverse_idx'
+            ),
+        )
 
     def __str__(self):
         return _(f"{self.recipe} in {self.user}'s favorites")
@@ -151,8 +207,95 @@ class ShoppingCart(models.Model):
             models.UniqueConstraint(
                 name='unique_cart',
                 fields=['author', 'recipe']
-            )
-        ),
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', 'author'),
+                name='shoppingcart_reverse_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name=_('user'),
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name=_('ingredient'),
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    amount = models.PositiveIntegerField(_('amount'))
+
+    class Meta:
+        verbose_name = _('shopping list item')
+        verbose_name_plural = _('shopping list items')
+        constraints = (
+            models.UniqueConstraint(
+                name='unique_shopping_list_item',
+                fields=['user', 'ingredient']
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} {self.amount}'
+
+
+class RecipeSearch(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name=_('recipe'),
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search'
+    )
+    search_vector = SearchVectorField(_('search vector'), null=True)
+
+    class Meta:
+        verbose_name = _('recipe search document')
+        verbose_name_plural = _('recipe search documents')
+        indexes = (
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe}'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name=_('user'),
+        on_delete=models.CASCADE,
+        related_name='feed'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name=_('recipe'),
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+
+    class Meta:
+        verbose_name = _('feed entry')
+        verbose_name_plural = _('feed entries')
+        constraints = (
+            models.UniqueConstraint(
+                name='unique_feed_entry',
+                fields=['user', 'recipe']
+            ),
+        )
 
     def __str__(self):
         return f'{self.recipe}'
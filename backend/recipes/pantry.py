@@ -0,0 +1,194 @@
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import RecipeIngredient
+
+VERSION_KEY = 'pantry_index_version'
+CHANGE_KEY = 'pantry_index_change:{}'
+
+
+def changed_recipes(since, version):
+    """Recipe ids changed after version `since` up to `version`.
+
+    None when the change log cannot tell: too many or expired changes,
+    or a change that may touch any recipe.
+    """
+    if not since <= version <= since + settings.PANTRY_INDEX_MAX_CHANGES:
+        return None
+    keys = [
+        CHANGE_KEY.format(number) for number in range(since + 1, version + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys) or None in changes.values():
+        return None
+    return set(changes.values())
+
+
+class Matches:
+    """Ranked matches, sorted lazily group by group when sliced.
+
+    Recipes with the same numbers of present and missing ingredients
+    share a rank, so only the groups a page falls into are ever sorted.
+    Items are (recipe_id, coverage, missing).
+    """
+
+    def __init__(self, groups):
+        self._groups = sorted(
+            (
+                (have / (have + missing), missing, recipe_ids)
+                for (have, missing), recipe_ids in groups.items()
+            ),
+            key=lambda group: (-group[0], group[1])
+        )
+        self._sorted = set()
+        self._length = sum(len(group[2]) for group in self._groups)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self._length)
+        items = []
+        offset = 0
+        for position, (coverage, missing, recipe_ids) in enumerate(
+            self._groups
+        ):
+            if offset >= stop:
+                break
+            end = offset + len(recipe_ids)
+            if end > start:
+                if position not in self._sorted:
+                    recipe_ids.sort(reverse=True)
+                    self._sorted.add(position)
+                items.extend(
+                    (recipe_id, coverage, missing)
+                    for recipe_id in recipe_ids[
+                        max(start - offset, 0):stop - offset
+                    ]
+                )
+            offset = end
+        return items
+
+
+class PantryIndex:
+    """Process-local inverted index from ingredient to recipe ids.
+
+    Posting lists are compact integer arrays, so matching a set of
+    ingredients is a C-level count over a few arrays instead of a GROUP BY
+    over RecipeIngredient. Signals bump the shared version and record the
+    changed recipe; a process behind by at most PANTRY_INDEX_MAX_CHANGES
+    versions reloads only those recipes, otherwise it rebuilds everything.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._recipes = {}
+        self._version = None
+        self._built_at = 0.0
+
+    def invalidate(self, recipe_id=None):
+        try:
+            version = cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY, 1, None)
+            version = 1
+        cache.set(
+            CHANGE_KEY.format(version), recipe_id, settings.PANTRY_INDEX_TTL
+        )
+
+    def load(self, rows):
+        """Replace the index with (ingredient_id, recipe_id) rows."""
+        postings = {}
+        recipes = {}
+        for ingredient_id, recipe_id in rows:
+            if ingredient_id not in postings:
+                postings[ingredient_id] = array('l')
+            postings[ingredient_id].append(recipe_id)
+            if recipe_id not in recipes:
+                recipes[recipe_id] = array('l')
+            recipes[recipe_id].append(ingredient_id)
+        self._postings = postings
+        self._recipes = recipes
+
+    def update_recipe(self, recipe_id, ingredient_ids):
+        for ingredient_id in self._recipes.pop(recipe_id, ()):
+            self._postings[ingredient_id].remove(recipe_id)
+        if not ingredient_ids:
+            return
+        self._recipes[recipe_id] = array('l', ingredient_ids)
+        for ingredient_id in ingredient_ids:
+            if ingredient_id not in self._postings:
+                self._postings[ingredient_id] = array('l')
+            self._postings[ingredient_id].append(recipe_id)
+
+    def _rows(self, recipe_ids=None):
+        queryset = RecipeIngredient.objects.all()
+        if recipe_ids is not None:
+            queryset = queryset.filter(recipe_id__in=recipe_ids)
+        return queryset.values_list(
+            'ingredient_id', 'recipe_id'
+        ).distinct().order_by().iterator(chunk_size=10000)
+
+    def _is_expired(self):
+        return (
+            self._version is None
+            or time.monotonic() - self._built_at >= settings.PANTRY_INDEX_TTL
+        )
+
+    def _refresh(self):
+        if (
+            not self._is_expired()
+            and self._version == cache.get(VERSION_KEY, 0)
+        ):
+            return
+        with self._lock:
+            version = cache.get(VERSION_KEY, 0)
+            if self._is_expired():
+                changes = None
+            elif self._version == version:
+                return
+            else:
+                changes = changed_recipes(self._version, version)
+
+            if changes is None:
+                self.load(self._rows())
+                self._built_at = time.monotonic()
+            else:
+                ingredients = {recipe_id: [] for recipe_id in changes}
+                for ingredient_id, recipe_id in self._rows(changes):
+                    ingredients[recipe_id].append(ingredient_id)
+                for recipe_id, ingredient_ids in ingredients.items():
+                    self.update_recipe(recipe_id, ingredient_ids)
+            self._version = version
+
+    def match(self, ingredient_ids, refresh=True):
+        """Recipes using any of the ingredients, best coverage first.
+
+        Coverage is the share of recipe ingredients in the set and missing
+        is the number of the rest. Ties go to fewer missing ingredients,
+        then to newer recipes.
+        """
+        if refresh:
+            self._refresh()
+        postings, recipes = self._postings, self._recipes
+        found = Counter()
+        for ingredient_id in set(ingredient_ids):
+            found.update(postings.get(ingredient_id, ()))
+        groups = defaultdict(list)
+        for recipe_id, have in found.items():
+            # A concurrent update_recipe may leave a posting briefly ahead.
+            missing = len(recipes.get(recipe_id, ())) - have
+            if missing >= 0:
+                groups[have, missing].append(recipe_id)
+        return Matches(groups)
+
+
+pantry_index = PantryIndex()
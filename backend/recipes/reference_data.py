@@ -0,0 +1,35 @@
+import time
+from uuid import uuid4
+
+from django.core.cache import cache
+from foodgram import replicas
+
+VERSION_KEY = 'reference_data_version:{}'
+
+
+def bump(model):
+    """Stamp a new version of the rows of the model, modified now.
+
+    The modification time always moves forward by at least a second, so
+    If-Modified-Since never matches a version from the same second.
+    """
+    key = VERSION_KEY.format(model._meta.label_lower)
+    previous = cache.get(key)
+    modified = int(time.time())
+    if previous is not None:
+        modified = max(modified, previous[1] + 1)
+    stamp = (uuid4().hex, modified)
+    cache.set(key, stamp, None)
+    replicas.fence()
+    return stamp
+
+
+def version(model):
+    """(version, modification timestamp) of the rows of the model."""
+    key = VERSION_KEY.format(model._meta.label_lower)
+    stamp = cache.get(key)
+    if stamp is None:
+        stamp = (uuid4().hex, int(time.time()))
+        if not cache.add(key, stamp, None):
+            stamp = cache.get(key, stamp)
+    return stamp
@@ -0,0 +1,125 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, TextField, Value, When
+
+from .models import Recipe, RecipeIngredient, RecipeSearch
+
+FTS_TABLE = 'recipes_recipe_fts'
+TOKEN = re.compile(r'\w+')
+
+
+def documents(recipe_ids):
+    """(id, name, text, ingredient names) of every recipe to index."""
+    ingredients = defaultdict(list)
+    for recipe_id, name in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'ingredient__name'):
+        ingredients[recipe_id].append(name)
+    for recipe_id, name, text in Recipe.objects.filter(
+        pk__in=recipe_ids
+    ).values_list('pk', 'name', 'text'):
+        yield recipe_id, name, text, ' '.join(ingredients[recipe_id])
+
+
+def vector(value, weight):
+    return SearchVector(
+        Value(value, output_field=TextField()),
+        weight=weight,
+        config=settings.RECIPE_SEARCH_CONFIG
+    )
+
+
+def index_recipes(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    if connection.vendor == 'postgresql':
+        for recipe_id, name, text, ingredients in documents(recipe_ids):
+            RecipeSearch.objects.update_or_create(
+                recipe_id=recipe_id,
+                defaults={'search_vector': (
+                    vector(name, 'A')
+                    + vector(ingredients, 'B')
+                    + vector(text, 'C')
+                )}
+            )
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(recipe_id,) for recipe_id in recipe_ids]
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                'VALUES (%s, %s, %s, %s)',
+                [
+                    (recipe_id, name, ingredients, text)
+                    for recipe_id, name, text, ingredients
+                    in documents(recipe_ids)
+                ]
+            )
+
+
+def unindex_recipe(recipe_id):
+    # PostgreSQL documents go away with the recipe through the cascade.
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+
+
+def rebuild(batch_size=1000):
+    recipe_ids = list(Recipe.objects.values_list('pk', flat=True))
+    for start in range(0, len(recipe_ids), batch_size):
+        index_recipes(recipe_ids[start:start + batch_size])
+    return len(recipe_ids)
+
+
+def fts_query(value):
+    """Quote every word of user input as an FTS5 prefix term."""
+    return ' '.join(
+        '"{}"*'.format(token) for token in TOKEN.findall(value.casefold())
+    )
+
+
+def search(queryset, value):
+    """Filter recipes by a search query and order them by relevance."""
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            value,
+            config=settings.RECIPE_SEARCH_CONFIG,
+            search_type='websearch'
+        )
+        return queryset.filter(
+            search__search_vector=query
+        ).annotate(
+            search_rank=SearchRank(F('search__search_vector'), query)
+        ).order_by('-search_rank', '-id')
+
+    if connection.vendor != 'sqlite':
+        return queryset.filter(name__icontains=value)
+    match = fts_query(value)
+    if not match:
+        return queryset.none()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 4.0, 1.0) LIMIT %s',
+            [match, settings.RECIPE_SEARCH_FALLBACK_LIMIT]
+        )
+        recipe_ids = [row[0] for row in cursor.fetchall()]
+    if not recipe_ids:
+        return queryset.none()
+    return queryset.filter(pk__in=recipe_ids).annotate(
+        search_rank=Case(
+            *(
+                When(pk=recipe_id, then=Value(-position))
+                for position, recipe_id in enumerate(recipe_ids)
+            ),
+            output_field=IntegerField()
+        )
+    ).order_by('-search_rank', '-id')
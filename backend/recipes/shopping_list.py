@@ -0,0 +1,113 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from users.models import User
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+def recipe_amounts(recipe):
+    """Total amount of every ingredient of the recipe."""
+    return Counter(dict(
+        RecipeIngredient.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient').annotate(
+            total=Sum('amount')
+        ).order_by()
+    ))
+
+
+def apply_deltas(user_ids, deltas):
+    """Add signed ingredient amounts to the shopping lists of the users.
+
+    The users are locked first, so concurrent changes to one list cannot
+    both insert the same new ingredient.
+    """
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not deltas:
+        return
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).order_by('pk').values_list('pk', flat=True))
+        items = ShoppingListItem.objects.filter(
+            user_id__in=user_ids, ingredient_id__in=deltas
+        )
+        existing = set(items.values_list('user_id', 'ingredient_id'))
+        by_delta = defaultdict(list)
+        for ingredient_id, delta in deltas.items():
+            by_delta[delta].append(ingredient_id)
+        for delta, ingredient_ids in by_delta.items():
+            items.filter(ingredient_id__in=ingredient_ids).update(
+                amount=F('amount') + delta
+            )
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user_id=user_id, ingredient_id=ingredient_id, amount=delta
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > 0 and (user_id, ingredient_id) not in existing
+        )
+        items.filter(amount__lte=0).delete()
+
+
+def add_recipe(user_id, recipe_id):
+    apply_deltas([user_id], recipe_amounts(recipe_id))
+
+
+def remove_recipe(user_id, recipe_id):
+    apply_deltas([user_id], {
+        ingredient_id: -amount
+        for ingredient_id, amount in recipe_amounts(recipe_id).items()
+    })
+
+
+def change_recipe(recipe, old_amounts, new_amounts):
+    """Propagate a change of recipe ingredients to every cart holding it."""
+    deltas = Counter(new_amounts)
+    deltas.subtract(old_amounts)
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('author_id', flat=True),
+        deltas
+    )
+
+
+def expected_items():
+    """Shopping list totals computed from scratch out of the carts."""
+    return {
+        (row['recipe__shopping_cart__author'], row['ingredient']):
+            row['total']
+        for row in RecipeIngredient.objects.filter(
+            recipe__shopping_cart__isnull=False
+        ).values(
+            'recipe__shopping_cart__author', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+def rebuild():
+    items = expected_items()
+    with transaction.atomic():
+        ShoppingListItem.objects.all().delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    amount=amount
+                )
+                for (user_id, ingredient_id), amount in items.items()
+            ),
+            batch_size=1000
+        )
+    return len(items)
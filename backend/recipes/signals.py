@@ -0,0 +1,158 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from users.models import Follow, User
+
+from . import counters, feed, reference_data, search, shopping_list, trending
+from .ingredient_index import ingredient_index
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, Tag)
+from .pantry import pantry_index
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, **kwargs):
+    transaction.on_commit(lambda: search.index_recipes([instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    search.unindex_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, **kwargs):
+    if not created:
+        recipe_ids = list(RecipeIngredient.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True).distinct())
+        transaction.on_commit(lambda: search.index_recipes(recipe_ids))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_pantry_index(sender, instance, **kwargs):
+    # A deleted instance has no pk any more by the commit.
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: pantry_index.invalidate(recipe_id))
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def update_pantry_index_row(sender, instance, **kwargs):
+    transaction.on_commit(
+        lambda: pantry_index.invalidate(instance.recipe_id)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_pantry_index_tags(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # Changes made from the tag side may touch any recipe.
+        recipe_id = None if reverse else instance.pk
+        transaction.on_commit(lambda: pantry_index.invalidate(recipe_id))
+
+
+@receiver(post_delete, sender=Tag)
+def rebuild_pantry_index(sender, **kwargs):
+    transaction.on_commit(pantry_index.invalidate)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_reference_data_version(sender, **kwargs):
+    transaction.on_commit(lambda: reference_data.bump(sender))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        shopping_list.add_recipe(instance.author_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # Every pre_delete of a cascade runs before any row is deleted, so the
+    # ingredients of a recipe being deleted are still there.
+    shopping_list.remove_recipe(instance.author_id, instance.recipe_id)
+
+
+def count_recipe(instance, field, delta):
+    counters.increment(Recipe, instance.recipe_id, field, delta)
+    if type(instance).recipe.is_cached(instance):
+        recipe = instance.recipe
+    else:
+        # Gone already when the recipe itself is being deleted.
+        recipe = Recipe.objects.only('pub_date').filter(
+            pk=instance.recipe_id
+        ).first()
+    if recipe is not None:
+        trending.refresh(recipe)
+
+
+@receiver(post_save, sender=Favorite)
+def count_favorite(sender, instance, created, **kwargs):
+    if created:
+        count_recipe(instance, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def uncount_favorite(sender, instance, **kwargs):
+    count_recipe(instance, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def count_cart(sender, instance, created, **kwargs):
+    if created:
+        count_recipe(instance, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def uncount_cart(sender, instance, **kwargs):
+    count_recipe(instance, 'in_carts_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def count_recipe_of_author(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(User, instance.author_id, 'recipes_count')
+        trending.refresh(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def uncount_recipe_of_author(sender, instance, **kwargs):
+    counters.increment(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follower(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(User, instance.author_id, 'followers_count')
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follower(sender, instance, **kwargs):
+    counters.increment(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    if created:
+        recipe_id, author_id = instance.pk, instance.author_id
+        transaction.on_commit(lambda: feed.fan_out(recipe_id, author_id))
+
+
+# Registered after the follower counters, which they read.
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.follower_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    feed.prune(instance.follower_id, instance.author_id)
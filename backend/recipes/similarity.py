@@ -0,0 +1,356 @@
+import fcntl
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from scipy import sparse
+
+from .models import Recipe, RecipeIngredient
+from .pantry import VERSION_KEY, changed_recipes
+
+ARRAYS = (
+    'recipe_ids', 'ingredient_ids', 'tag_ids',
+    'row_indptr', 'row_indices', 'column_indptr', 'column_indices',
+    'column_data',
+)
+CURRENT = 'current'
+
+
+def ingredient_rows(recipe_ids=None):
+    queryset = RecipeIngredient.objects.all()
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    return queryset.values_list(
+        'recipe_id', 'ingredient_id'
+    ).distinct().order_by().iterator(chunk_size=10000)
+
+
+def tag_rows(recipe_ids=None):
+    queryset = Recipe.tags.through.objects.all()
+    if recipe_ids is not None:
+        queryset = queryset.filter(recipe_id__in=recipe_ids)
+    return queryset.values_list('recipe_id', 'tag_id').iterator(
+        chunk_size=10000
+    )
+
+
+def pairs(rows):
+    return np.fromiter(
+        rows, dtype=[('recipe', np.int64), ('feature', np.int64)]
+    )
+
+
+def positions(known, ids):
+    """Positions of those of the ids found in the sorted array."""
+    ids = np.asarray(list(ids), dtype=np.int64)
+    if not len(known):
+        return np.empty(0, dtype=np.int64)
+    found = np.minimum(np.searchsorted(known, ids), len(known) - 1)
+    return found[known[found] == ids]
+
+
+def cosine(ingredients, tags, other_ingredients, other_tags, weight):
+    norm = (len(ingredients) + weight * len(tags)) * (
+        len(other_ingredients) + weight * len(other_tags)
+    )
+    if not norm:
+        return 0.0
+    return (
+        len(ingredients & other_ingredients)
+        + weight * len(tags & other_tags)
+    ) / math.sqrt(norm)
+
+
+class SimilarityMatrix:
+    """Sparse recipe x feature matrix of ingredient and tag sets.
+
+    A feature is an ingredient, or a tag weighted so that a shared tag
+    counts SIMILAR_RECIPES_TAG_WEIGHT of a shared ingredient. Columns
+    are kept as a CSC matrix of unit rows, so the cosine similarity to
+    every recipe is one product of the query columns with the query.
+    The arrays are saved with np.save and memory-mapped when loaded, so
+    the worker processes of a host share one copy of them.
+    """
+
+    def __init__(self, arrays, version, tag_weight):
+        self.arrays = arrays
+        self.version = version
+        self.tag_weight = tag_weight
+        self.recipe_ids = arrays['recipe_ids']
+        self.ingredient_ids = arrays['ingredient_ids']
+        self.tag_ids = arrays['tag_ids']
+        self.row_indptr = arrays['row_indptr']
+        self.row_indices = arrays['row_indices']
+        self.columns = sparse.csc_matrix(
+            (
+                arrays['column_data'],
+                arrays['column_indices'],
+                arrays['column_indptr']
+            ),
+            shape=(
+                len(self.recipe_ids),
+                len(self.ingredient_ids) + len(self.tag_ids)
+            ),
+            copy=False
+        )
+
+    @classmethod
+    def build(cls, ingredient_pairs, tag_pairs, version=0, tag_weight=None):
+        """Matrix of (recipe_id, ingredient_id) and (recipe_id, tag_id)
+        pairs, given as structured arrays, see pairs()."""
+        if tag_weight is None:
+            tag_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT
+        recipe_ids = np.union1d(
+            ingredient_pairs['recipe'], tag_pairs['recipe']
+        )
+        ingredient_ids = np.unique(ingredient_pairs['feature'])
+        tag_ids = np.unique(tag_pairs['feature'])
+        rows = np.concatenate((
+            np.searchsorted(recipe_ids, ingredient_pairs['recipe']),
+            np.searchsorted(recipe_ids, tag_pairs['recipe']),
+        ))
+        features = np.concatenate((
+            np.searchsorted(ingredient_ids, ingredient_pairs['feature']),
+            len(ingredient_ids)
+            + np.searchsorted(tag_ids, tag_pairs['feature']),
+        ))
+        values = np.concatenate((
+            np.ones(len(ingredient_pairs)),
+            np.full(len(tag_pairs), np.sqrt(tag_weight)),
+        ))
+        matrix = sparse.csr_matrix(
+            (values, (rows, features)),
+            shape=(len(recipe_ids), len(ingredient_ids) + len(tag_ids))
+        )
+        matrix.sum_duplicates()
+        norms = np.sqrt(np.asarray(matrix.power(2).sum(axis=1)).ravel())
+        columns = sparse.csc_matrix(
+            sparse.diags(1 / norms) @ matrix, dtype=np.float32
+        )
+        return cls({
+            'recipe_ids': recipe_ids,
+            'ingredient_ids': ingredient_ids,
+            'tag_ids': tag_ids,
+            'row_indptr': matrix.indptr.astype(np.int64),
+            'row_indices': matrix.indices.astype(np.int32),
+            'column_indptr': columns.indptr.astype(np.int64),
+            'column_indices': columns.indices.astype(np.int32),
+            'column_data': columns.data,
+        }, version, tag_weight)
+
+    def save(self, path):
+        os.makedirs(path)
+        for name, array in self.arrays.items():
+            np.save(os.path.join(path, f'{name}.npy'), array)
+        with open(os.path.join(path, 'meta.json'), 'w') as file:
+            json.dump(
+                {'version': self.version, 'tag_weight': self.tag_weight},
+                file
+            )
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'meta.json')) as file:
+            meta = json.load(file)
+        return cls(
+            {
+                name: np.load(
+                    os.path.join(path, f'{name}.npy'), mmap_mode='r'
+                )
+                for name in ARRAYS
+            },
+            meta['version'],
+            meta['tag_weight']
+        )
+
+    def rows(self, recipe_ids):
+        """Row numbers of those of the recipes in the matrix."""
+        return positions(self.recipe_ids, recipe_ids)
+
+    def features(self, row):
+        """(ingredient ids, tag ids) of the recipe in the row."""
+        columns = self.row_indices[
+            self.row_indptr[row]:self.row_indptr[row + 1]
+        ]
+        split = np.searchsorted(columns, len(self.ingredient_ids))
+        return (
+            frozenset(self.ingredient_ids[columns[:split]].tolist()),
+            frozenset(self.tag_ids[
+                columns[split:] - len(self.ingredient_ids)
+            ].tolist())
+        )
+
+    def scores(self, ingredient_ids, tag_ids):
+        """Cosine similarity of every row to the ingredient and tag sets."""
+        norm = math.sqrt(
+            len(ingredient_ids) + self.tag_weight * len(tag_ids)
+        )
+        ingredients = positions(self.ingredient_ids, ingredient_ids)
+        tags = positions(self.tag_ids, tag_ids)
+        query = np.concatenate((
+            np.full(len(ingredients), 1 / norm),
+            np.full(len(tags), math.sqrt(self.tag_weight) / norm),
+        ))
+        return self.columns[
+            :, np.concatenate((ingredients, len(self.ingredient_ids) + tags))
+        ] @ query
+
+
+def build_matrix():
+    # Changes from the version on are replayed over the matrix.
+    version = cache.get(VERSION_KEY, 0)
+    return SimilarityMatrix.build(
+        pairs(ingredient_rows()), pairs(tag_rows()), version
+    )
+
+
+def publish(matrix, directory):
+    """Save the matrix and make it the current one of the directory."""
+    os.makedirs(directory, exist_ok=True)
+    name = f'{time.time_ns()}'
+    matrix.save(os.path.join(directory, name))
+    link = os.path.join(directory, f'.{name}')
+    os.symlink(name, link)
+    os.replace(link, os.path.join(directory, CURRENT))
+    # Processes keep the mapped files of a removed build until they
+    # switch, the previous build is kept for the ones still loading it.
+    builds = sorted(
+        entry for entry in os.listdir(directory) if entry.isdigit()
+    )
+    for entry in builds[:-2]:
+        shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+    return os.path.join(directory, name)
+
+
+class SimilarityIndex:
+    """Similar recipes from the shared matrix and recent changes.
+
+    The matrix is built offline by the build_similarity_matrix command,
+    or by one process when there is none or the pantry change log lost
+    track of changes; the others wait and load the same files. Recipes
+    changed since the build, by the change log, are reloaded from the
+    database into a small per-process overlay which replaces their rows.
+    """
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        # The matrix and its overlay, replaced together.
+        self._state = (None, {})
+        self._path = None
+        self._version = None
+
+    @property
+    def directory(self):
+        return self._directory or settings.SIMILAR_RECIPES_MATRIX_DIR
+
+    def current_path(self):
+        try:
+            return os.path.realpath(
+                os.path.join(self.directory, CURRENT), strict=True
+            )
+        except OSError:
+            return None
+
+    def _build(self, stale_path):
+        """Publish a new matrix unless another process just did."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            path = self.current_path()
+            if path is None or path == stale_path:
+                path = publish(build_matrix(), self.directory)
+            return path
+
+    def _load(self, path):
+        matrix = SimilarityMatrix.load(path)
+        self._state = (matrix, {})
+        self._path = path
+        self._version = matrix.version
+
+    def _refresh(self):
+        path = self.current_path()
+        version = cache.get(VERSION_KEY, 0)
+        if path is not None and (path, version) == (self._path, self._version):
+            return
+        with self._lock:
+            path = self.current_path() or self._build(None)
+            if path != self._path:
+                self._load(path)
+            version = cache.get(VERSION_KEY, 0)
+            if version == self._version:
+                return
+            changes = changed_recipes(self._version, version)
+            if changes is None:
+                self._load(self._build(self._path))
+                # Changes up to the version of the build are in it.
+                changes = changed_recipes(self._version, version) or set()
+            matrix, overlay = self._state
+            self._state = (matrix, {**overlay, **self._recipes(changes)})
+            self._version = version
+
+    def _recipes(self, recipe_ids):
+        ingredients = defaultdict(set)
+        tags = defaultdict(set)
+        for recipe_id, ingredient_id in ingredient_rows(recipe_ids):
+            ingredients[recipe_id].add(ingredient_id)
+        for recipe_id, tag_id in tag_rows(recipe_ids):
+            tags[recipe_id].add(tag_id)
+        return {
+            recipe_id: (
+                frozenset(ingredients[recipe_id]), frozenset(tags[recipe_id])
+            )
+            for recipe_id in recipe_ids
+        }
+
+    def similar(self, recipe_id, limit, refresh=True):
+        """Top recipes by cosine similarity of ingredient and tag sets.
+
+        Items are (recipe_id, similarity), the most similar first.
+        """
+        if limit <= 0:
+            return []
+        if refresh:
+            self._refresh()
+        matrix, overlay = self._state
+        if recipe_id in overlay:
+            ingredients, tags = overlay[recipe_id]
+        else:
+            rows = matrix.rows([recipe_id])
+            if not len(rows):
+                return []
+            ingredients, tags = matrix.features(rows[0])
+        if not ingredients and not tags:
+            return []
+
+        scores = matrix.scores(ingredients, tags)
+        scores[matrix.rows([recipe_id, *overlay])] = 0
+        count = min(limit, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count] if count else []
+        found = [
+            (float(scores[row]), int(matrix.recipe_ids[row]))
+            for row in top if scores[row] > 0
+        ]
+        for other_id, (other_ingredients, other_tags) in overlay.items():
+            if other_id == recipe_id:
+                continue
+            similarity = cosine(
+                ingredients, tags, other_ingredients, other_tags,
+                matrix.tag_weight
+            )
+            if similarity > 0:
+                found.append((float(similarity), other_id))
+        found.sort(reverse=True)
+        return [
+            (other_id, similarity) for similarity, other_id in found[:limit]
+        ]
+
+
+similarity_index = SimilarityIndex()
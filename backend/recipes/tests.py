@@ -0,0 +1,290 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from users.models import Follow, User
+
+from . import shopping_list
+from .models import (Favorite, FeedEntry, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart, ShoppingListItem, Tag)
+from .similarity import similarity_index
+
+
+class ShoppingListTest(TestCase):
+    """Shopping lists follow carts and recipes changed outside the API."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            username='admin',
+            first_name='Name',
+            last_name='Surname',
+            password='password-123'
+        )
+        cls.tag = Tag.objects.create(name='tag', color='#000000', slug='tag')
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ingredient{number}',
+                                      measurement_unit='g')
+            for number in range(3)
+        ]
+
+    def setUp(self):
+        self.recipe = Recipe.objects.create(
+            name='recipe', text='text', cooking_time=5, author=self.admin,
+            image='media/recipe.png'
+        )
+        self.recipe.tags.set([self.tag])
+        for ingredient in self.ingredients[:2]:
+            RecipeIngredient.objects.create(
+                recipe=self.recipe, ingredient=ingredient, amount=10
+            )
+
+    def stored_items(self):
+        return dict(ShoppingListItem.objects.values_list(
+            'ingredient_id', 'amount'
+        ))
+
+    def assert_in_sync(self):
+        self.assertEqual(
+            {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                )
+            },
+            shopping_list.expected_items()
+        )
+
+    def test_cart_rows(self):
+        cart = ShoppingCart.objects.create(
+            author=self.admin, recipe=self.recipe
+        )
+        self.assertEqual(self.stored_items(), {
+            self.ingredients[0].pk: 10, self.ingredients[1].pk: 10
+        })
+        cart.delete()
+        self.assertEqual(self.stored_items(), {})
+
+    def test_recipe_deleted(self):
+        ShoppingCart.objects.create(author=self.admin, recipe=self.recipe)
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('admin:recipes_recipe_delete', args=[self.recipe.pk]),
+            {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.stored_items(), {})
+
+    def test_admin_inline_edit(self):
+        ShoppingCart.objects.create(author=self.admin, recipe=self.recipe)
+        rows = list(self.recipe.recipe_ingredients.order_by('pk'))
+        self.client.force_login(self.admin)
+        response = self.client.post(
+            reverse('admin:recipes_recipe_change', args=[self.recipe.pk]),
+            {
+                'name': 'recipe',
+                'text': 'text',
+                'cooking_time': 5,
+                'author': self.admin.pk,
+                'tags': [self.tag.pk],
+                'recipe_ingredients-TOTAL_FORMS': 3,
+                'recipe_ingredients-INITIAL_FORMS': 2,
+                'recipe_ingredients-0-id': rows[0].pk,
+                'recipe_ingredients-0-recipe': self.recipe.pk,
+                'recipe_ingredients-0-ingredient': self.ingredients[0].pk,
+                'recipe_ingredients-0-amount': 25,
+                'recipe_ingredients-1-id': rows[1].pk,
+                'recipe_ingredients-1-recipe': self.recipe.pk,
+                'recipe_ingredients-1-ingredient': self.ingredients[1].pk,
+                'recipe_ingredients-1-amount': 10,
+                'recipe_ingredients-1-DELETE': 'on',
+                'recipe_ingredients-2-recipe': self.recipe.pk,
+                'recipe_ingredients-2-ingredient': self.ingredients[2].pk,
+                'recipe_ingredients-2-amount': 5,
+            }
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.stored_items(), {
+            self.ingredients[0].pk: 25, self.ingredients[2].pk: 5
+        })
+        self.assert_in_sync()
+
+
+class CountersTest(TestCase):
+    """Counters follow rows created and deleted outside the API."""
+
+    def setUp(self):
+        self.author, self.user = [
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name='Name',
+                last_name='Surname',
+                password='password-123'
+            )
+            for username in ('author', 'user')
+        ]
+        self.recipe = Recipe.objects.create(
+            name='recipe', text='text', cooking_time=5, author=self.author,
+            image='media/recipe.png'
+        )
+
+    def test_created(self):
+        score = Recipe.objects.get(pk=self.recipe.pk).trending_score
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(author=self.user, recipe=self.recipe)
+        Follow.objects.create(follower=self.user, author=self.author)
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.recipe.in_carts_count, 1)
+        self.assertGreater(score, 0)
+        self.assertGreater(self.recipe.trending_score, score)
+
+    def test_user_deleted(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        ShoppingCart.objects.create(author=self.user, recipe=self.recipe)
+        Follow.objects.create(follower=self.user, author=self.author)
+        self.user.delete()
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertEqual(self.recipe.favorites_count, 0)
+        self.assertEqual(self.recipe.in_carts_count, 0)
+
+    def test_recipe_deleted(self):
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+        self.recipe.delete()
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+
+
+class FeedTest(TestCase):
+    """Feeds follow recipes and subscriptions changed outside the API."""
+
+    def setUp(self):
+        self.author, self.reader, self.other = [
+            User.objects.create_user(
+                email=f'{username}@example.com',
+                username=username,
+                first_name='Name',
+                last_name='Surname',
+                password='password-123'
+            )
+            for username in ('author', 'reader', 'other')
+        ]
+
+    def create_recipe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                name='recipe', text='text', cooking_time=5,
+                author=self.author, image='media/recipe.png'
+            )
+
+    def feed(self, user):
+        return set(FeedEntry.objects.filter(user=user).values_list(
+            'recipe_id', flat=True
+        ))
+
+    def test_feed(self):
+        old = self.create_recipe()
+        follow = Follow.objects.create(follower=self.reader,
+                                       author=self.author)
+        self.assertEqual(self.feed(self.reader), {old.pk})
+        new = self.create_recipe()
+        self.assertEqual(self.feed(self.reader), {old.pk, new.pk})
+        follow.delete()
+        self.assertEqual(self.feed(self.reader), set())
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_no_longer_popular(self):
+        Follow.objects.create(follower=self.reader, author=self.author)
+        follow = Follow.objects.create(follower=self.other,
+                                       author=self.author)
+        recipe = self.create_recipe()
+        self.assertEqual(self.feed(self.reader), set())
+        follow.delete()
+        self.assertEqual(self.feed(self.reader), {recipe.pk})
+
+
+class SimilarRecipesTest(TestCase):
+    """Similar recipes come from the shared matrix and recent changes."""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(
+            SIMILAR_RECIPES_MATRIX_DIR=directory
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        author = User.objects.create_user(
+            email='author@example.com',
+            username='author',
+            first_name='Name',
+            last_name='Surname',
+            password='password-123'
+        )
+        self.ingredients = [
+            Ingredient.objects.create(name=f'ingredient{number}',
+                                      measurement_unit='g')
+            for number in range(4)
+        ]
+        self.recipes = []
+        for ingredients in ((0, 1, 2), (0, 1, 3), (0, 3), (3,)):
+            recipe = Recipe.objects.create(
+                name='recipe', text='text', cooking_time=5, author=author,
+                image='media/recipe.png'
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe,
+                                 ingredient=self.ingredients[number],
+                                 amount=10)
+                for number in ingredients
+            )
+            self.recipes.append(recipe)
+
+    def similar(self):
+        response = self.client.get(
+            f'/api/recipes/{self.recipes[0].pk}/similar/'
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item['id'], item['similarity']) for item in response.data
+        ]
+
+    def test_similar(self):
+        self.assertEqual(self.similar(), [
+            (self.recipes[1].pk, round(2 / 3, 4)),
+            (self.recipes[2].pk, round(1 / 6 ** 0.5, 4)),
+        ])
+        path = similarity_index.current_path()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeIngredient.objects.create(
+                recipe=self.recipes[3], ingredient=self.ingredients[0],
+                amount=10
+            )
+            RecipeIngredient.objects.create(
+                recipe=self.recipes[3], ingredient=self.ingredients[1],
+                amount=10
+            )
+            self.recipes[1].delete()
+        expected = [
+            (self.recipes[3].pk, round(2 / 3, 4)),
+            (self.recipes[2].pk, round(1 / 6 ** 0.5, 4)),
+        ]
+        self.assertEqual(self.similar(), expected)
+        self.assertEqual(similarity_index.current_path(), path)
+
+        # Without the change log the matrix is built again.
+        cache.clear()
+        self.assertEqual(self.similar(), expected)
+        self.assertNotEqual(similarity_index.current_path(), path)
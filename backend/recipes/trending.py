@@ -0,0 +1,64 @@
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Log
+
+from .models import Recipe
+
+EPOCH = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+# Recipe trending score is log2(popularity) + freshness. Ordering by it
+# equals ordering by popularity halved for every half-life of recipe age,
+# and the order does not drift as time passes, so the score only has to
+# change together with the favorite and cart counters.
+
+
+def freshness(pub_date):
+    """Publication time in half-lives since EPOCH."""
+    half_life = settings.TRENDING_HALF_LIFE_DAYS * 24 * 60 * 60
+    return (pub_date - EPOCH).total_seconds() / half_life
+
+
+def popularity(favorites_count, in_carts_count):
+    return (
+        1
+        + settings.TRENDING_FAVORITE_WEIGHT * favorites_count
+        + settings.TRENDING_CART_WEIGHT * in_carts_count
+    )
+
+
+def score(recipe):
+    return math.log2(
+        popularity(recipe.favorites_count, recipe.in_carts_count)
+    ) + freshness(recipe.pub_date)
+
+
+def refresh(recipe):
+    """Recompute the score of a recipe from its counters in the database."""
+    Recipe.objects.filter(pk=recipe.pk).update(
+        trending_score=Log(
+            2, popularity(F('favorites_count'), F('in_carts_count'))
+        ) + Value(freshness(recipe.pub_date))
+    )
+
+
+def refresh_all(batch_size=1000):
+    """Recompute every score, return the number of updated recipes."""
+    updated = 0
+    batch = []
+    for recipe in Recipe.objects.only(
+        'pk', 'pub_date', 'favorites_count', 'in_carts_count',
+        'trending_score'
+    ).order_by('pk').iterator(chunk_size=batch_size):
+        value = score(recipe)
+        if not math.isclose(recipe.trending_score, value, abs_tol=1e-9):
+            recipe.trending_score = value
+            batch.append(recipe)
+        if len(batch) >= batch_size:
+            Recipe.objects.bulk_update(batch, ['trending_score'])
+            updated += len(batch)
+            batch = []
+    Recipe.objects.bulk_update(batch, ['trending_score'])
+    return updated + len(batch)
@@ -0,0 +1,31 @@
+# Generated by Django 3.2 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='follow',
+            options={'ordering': ('id',), 'verbose_name': 'subscription', 'verbose_name_plural': 'subscriptions'},
+        ),
+        migrations.AlterModelOptions(
+            name='user',
+            options={'ordering': ('id',), 'verbose_name': 'user', 'verbose_name_plural': 'users'},
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='followers count'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='recipes count'),
+        ),
+    ]
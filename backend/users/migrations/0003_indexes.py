@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-18 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'follower'], name='follow_reverse_idx'),
+        ),
+    ]
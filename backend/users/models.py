@@ -45,6 +45,12 @@ class User(AbstractUser):
         _('password'),
         max_length=USR
     )
+    recipes_count = models.PositiveIntegerField(
+        _('recipes count'), default=0, editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        _('followers count'), default=0, editable=False
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'password']
@@ -84,6 +90,12 @@ class Follow(models.Model):
                 name='unique_subscription'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'follower'],
+                name='follow_reverse_idx'
+            )
+        ]
 
     def __str__(self):
         return str(_(f'{self.follower} subscribed to: {self.author}'))